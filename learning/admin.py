@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile, Subject, Topic, Project, Category
+from .models import Profile, Subject, Topic, Project, Category, Job
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -45,4 +45,10 @@ class TopicAdmin(admin.ModelAdmin):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ("title", "user", "subject", "status", "created_at")
\ No newline at end of file
+    list_display = ("title", "user", "subject", "status", "created_at")
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "key", "status", "attempts", "run_after", "created_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("created_at",)
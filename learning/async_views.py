@@ -0,0 +1,96 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.cache import never_cache
+
+from .conditional import atopic_conditional, asubject_conditional
+from .decorators import count_topic_views, query_budget, read_replica
+from .models import Project, Subject, Topic
+from .navigation import related_topics, topic_navigation
+from .popularity import popular_topics
+from .page_cache import cache_public_page, subject_pages, TOPICS, PROJECTS
+from .pagination import apaginate_keyset, wants_json, keyset_json_response
+from .search import search_topics
+from .views import _topic_json, spelling_suggestions
+
+# Coroutine versions of the public read views, routed instead of the ones in
+# views.py when ASYNC_PUBLIC_VIEWS is on (the default under asgi.py). Queries use
+# the async ORM; templates are rendered in a worker thread because the context
+# processors and `request.user` are lazy and load from the database on first use.
+
+arender = sync_to_async(render)
+
+
+@query_budget(2, signed_in=8)
+@read_replica
+@cache_public_page(lambda: [TOPICS])
+@never_cache
+async def home(request):
+    """Public landing page showing only live topics."""
+    topics = Topic.objects.listing().filter(status='published').select_related('subject')
+    page = await apaginate_keyset(request, topics, keys=('-created_at', '-id'))
+    if wants_json(request):
+        return keyset_json_response(page, _topic_json)
+    return await arender(request, 'home.html', {'topics': page.items, 'page': page})
+
+
+@query_budget(4, signed_in=10)
+@read_replica
+@asubject_conditional
+@cache_public_page(lambda slug: [subject_pages(slug)])
+async def subject_topics(request, slug):
+    """List of published topics within a specific subject."""
+    subject = await aget_object_or_404(Subject, slug=slug)
+    topics = Topic.objects.listing().filter(subject=subject, status='published').select_related('subject')
+    page = await apaginate_keyset(request, topics, keys=('id',))
+    if wants_json(request):
+        return keyset_json_response(page, _topic_json)
+    return await arender(request, 'subject_topics.html', {
+        'subject': subject,
+        'topics': page.items,
+        'page': page,
+        'popular_topics': await sync_to_async(popular_topics)(subject),
+    })
+
+
+@query_budget(4, signed_in=10)
+@count_topic_views
+@read_replica
+@atopic_conditional
+@cache_public_page(lambda subject_slug, topic_slug: [subject_pages(subject_slug)])
+async def topic_detail(request, subject_slug, topic_slug):
+    """Detailed article view."""
+    topic = await aget_object_or_404(
+        Topic.objects.select_related('subject'),
+        slug=topic_slug, subject__slug=subject_slug, status='published',
+    )
+    sidebar_topics, previous_topic, next_topic = await sync_to_async(topic_navigation)(topic)
+    return await arender(request, 'learning/topic_detail.html', {
+        'topic': topic,
+        'sidebar_topics': sidebar_topics,
+        'next_topic': next_topic,
+        'previous_topic': previous_topic,
+        'related_topics': await sync_to_async(related_topics)(topic),
+    })
+
+
+@query_budget(2, signed_in=8)
+@read_replica
+@cache_public_page(lambda pk: [PROJECTS])
+async def project_detail(request, pk):
+    """projects/1/"""
+    project = await aget_object_or_404(Project.objects.select_related('subject', 'category', 'user'), pk=pk)
+    return await arender(request, 'learning/project_detail.html', {'project': project})
+
+
+@query_budget(3, signed_in=9)
+@read_replica
+@cache_public_page(lambda: [TOPICS])
+async def search(request):
+    """Search functionality restricted to published content."""
+    query = request.GET.get('q', '').strip()
+    # The FTS5 query goes through a raw cursor
+    results = await sync_to_async(search_topics)(query) if query else []
+    return await arender(request, 'search_results.html', {
+        'query': query, 'results': results,
+        'suggestions': await sync_to_async(spelling_suggestions)(query, results),
+    })
@@ -0,0 +1,34 @@
+import time
+
+from django.core.cache import cache
+
+# Generation counters: cached data embeds the current version of whatever it
+# depends on in its key, and bumping the version makes every old entry
+# unreachable without having to find and delete it. Counters never expire
+# unless given a timeout: without a shared cache a bump only reaches the worker
+# that made it, and a timeout lets the other workers start over with a fresh one.
+VERSION_KEY = 'learning:version:{}'
+
+
+def _fresh_version():
+    # Seeded from the clock so a counter that was evicted from the cache can
+    # never restart at a value that old entries were stored under.
+    return time.time_ns() // 1000
+
+
+def get_version(name, timeout=None):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=timeout)
+        version = cache.get(key, _fresh_version())
+    return version
+
+
+def bump_version(*names, timeout=None):
+    for name in names:
+        key = VERSION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), timeout=timeout)
@@ -0,0 +1,86 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from .cache import get_version
+from .page_cache import SITE, subject_pages
+from .popularity import popularity_epoch
+from .roles import get_role
+
+# ETags for conditional GET, made from the generation counters that also retire
+# cached pages: whatever changes a topic or subject page bumps one of them. That
+# costs a few cache reads and no queries, so a matching If-None-Match gets a 304
+# before the page cache or the database is consulted. There is no Last-Modified:
+# unpublishing, deletes, renames and nav changes have no timestamp to advance it.
+
+
+def _viewer(request):
+    # Signed-in pages show the username and role links, so each viewer gets their own tag
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}:{get_role(request)}'
+    return 'anon'
+
+
+def _has_pending_messages(request):
+    return len(get_messages(request)) > 0
+
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def topic_etag(request, subject_slug, topic_slug):
+    if _has_pending_messages(request):
+        return None
+    # The sidebar lists the whole subject, so any change in it changes the page
+    return _etag(
+        subject_slug, topic_slug,
+        get_version(SITE), get_version(subject_pages(subject_slug)), _viewer(request),
+    )
+
+
+def subject_etag(request, slug):
+    if _has_pending_messages(request):
+        return None
+    return _etag(
+        slug, get_version(SITE), get_version(subject_pages(slug)), _viewer(request),
+        # The popular list moves with views rather than edits
+        popularity_epoch(),
+    )
+
+
+topic_conditional = condition(etag_func=topic_etag)
+subject_conditional = condition(etag_func=subject_etag)
+
+
+def async_condition(etag_func):
+    """
+    condition() for coroutine views. Django's version calls the validator inside
+    the event loop; ours touches the session and the cache, so it runs in a
+    worker thread here.
+    """
+    def validator(request, *args, **kwargs):
+        etag = etag_func(request, *args, **kwargs)
+        return quote_etag(etag) if etag is not None else None
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            etag = await sync_to_async(validator)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and etag:
+                response.headers.setdefault('ETag', etag)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+atopic_conditional = async_condition(topic_etag)
+asubject_conditional = async_condition(subject_etag)
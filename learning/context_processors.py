@@ -1,9 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_version
 from .models import Subject
 
+NAV_SUBJECTS_VERSION = 'nav_subjects'
+
+# Process-local (version, subjects) pair; replaced as a whole so threads never see half an update
+_local_cache = (None, None)
+
+
+def _load_nav_subjects():
+    return list(Subject.objects.filter(is_active=True).order_by('display_order'))
+
+
+def get_nav_subjects():
+    """
+    Active subjects for the navigation, cached until a Subject is saved or deleted.
+    NAV_SUBJECTS_CACHE = 'shared' also stores the list in the default cache so that
+    workers sharing a cache backend only build it once per version.
+    """
+    global _local_cache
+    version = get_version(NAV_SUBJECTS_VERSION)
+    cached_version, cached_subjects = _local_cache
+    if cached_version == version:
+        return cached_subjects
+
+    if getattr(settings, 'NAV_SUBJECTS_CACHE', 'local') == 'shared':
+        key = f'learning:nav_subjects:{version}'
+        subjects = cache.get(key)
+        if subjects is None:
+            subjects = _load_nav_subjects()
+            cache.set(key, subjects, None)
+    else:
+        subjects = _load_nav_subjects()
+
+    _local_cache = (version, subjects)
+    return subjects
+
+
 def subjects_processor(request):
-    # 🟢 Show all active subjects so the sidebar is populated immediately
-    nav_subjects = Subject.objects.filter(is_active=True).order_by('display_order')
+    # 🟢 Show all active subjects so the sidebar is populated immediately.
+    # Lazy, so pages that never render the nav never touch the cache or database.
+    nav_subjects = SimpleLazyObject(get_nav_subjects)
 
     return {
         'nav_subjects': nav_subjects
-    }
\ No newline at end of file
+    }
@@ -1,12 +1,84 @@
+from asgiref.sync import iscoroutinefunction
 from django.core.exceptions import PermissionDenied
 from functools import wraps
+from .popularity import UNCOUNTED_HEADER, record_view
+from .roles import get_role
+from .routers import PIN_COOKIE, reading_from_replica, replica_enabled
 
 def role_required(allowed_roles=[]):
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            if request.user.is_authenticated and request.user.profile.role in allowed_roles:
+            if request.user.is_authenticated and get_role(request) in allowed_roles:
                 return view_func(request, *args, **kwargs)
             raise PermissionDenied
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def query_budget(max_queries, signed_in=None):
+    """
+    Declare the most queries a single request to this view may run (see
+    instrumentation.py). Public pages serve anonymous readers from the page cache
+    and signed-in ones through the session, user and role lookups, so they give
+    the second path its own `signed_in` budget rather than loosening the first.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        view_func.signed_in_query_budget = max_queries if signed_in is None else signed_in
+        return view_func
+    return decorator
+
+
+def read_replica(view_func):
+    """Serve safe requests from the read replica unless the browser is pinned to the primary."""
+    def _use_replica(request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and replica_enabled()
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            if _use_replica(request):
+                # sync_to_async() copies the context, so ORM calls in worker threads see it too
+                with reading_from_replica():
+                    return await view_func(request, *args, **kwargs)
+            return await view_func(request, *args, **kwargs)
+        return _async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if _use_replica(request):
+            with reading_from_replica():
+                return view_func(request, *args, **kwargs)
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def count_topic_views(view_func):
+    """
+    Count successful GETs of a topic page, including ones answered from the page
+    cache or with a 304, so it goes outside those decorators. Renders for the
+    static site send UNCOUNTED_HEADER and are skipped. See popularity.py.
+    """
+    def _record(request, response, topic_slug):
+        if (
+            request.method == 'GET' and response.status_code in (200, 304)
+            and UNCOUNTED_HEADER not in request.META
+        ):
+            record_view(topic_slug)
+        return response
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            return _record(request, await view_func(request, *args, **kwargs), kwargs['topic_slug'])
+        return _async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        return _record(request, view_func(request, *args, **kwargs), kwargs['topic_slug'])
+    return _wrapped_view
@@ -0,0 +1,135 @@
+import json
+import zipfile
+
+from asgiref.sync import sync_to_async
+
+from .models import Topic
+
+# Formats that can be streamed as a single download; the command can also
+# write `markdown` (one file per topic) into a directory.
+STREAM_FORMATS = {
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'zip': ('application/zip', 'zip'),
+}
+EXPORT_CHUNK_SIZE = 200
+
+
+def export_topics(subject=None, include_unpublished=False):
+    """Topics to export in a stable order; the rendered HTML copy is left in the database."""
+    topics = (
+        Topic.objects.select_related('subject', 'author')
+        .defer('content_html')
+        .prefetch_related('references')
+        .order_by('subject_id', 'id')
+    )
+    if subject is not None:
+        topics = topics.filter(subject=subject)
+    if not include_unpublished:
+        topics = topics.filter(status='published')
+    return topics
+
+
+def iter_export(topics, chunk_size=EXPORT_CHUNK_SIZE):
+    # iterator() fetches `chunk_size` rows at a time (and prefetches their references
+    # per chunk), so memory stays flat however many topics there are
+    return topics.iterator(chunk_size=chunk_size)
+
+
+def topic_record(topic):
+    """Everything import_content needs to recreate the topic."""
+    return {
+        'title': topic.title,
+        'slug': topic.slug,
+        'subject': topic.subject.name,
+        'author': topic.author.username,
+        'status': topic.status,
+        'difficulty': topic.difficulty,
+        'created_at': topic.created_at.isoformat(),
+        'updated_at': topic.updated_at.isoformat(),
+        'content': topic.content,
+        'references': [
+            {'source_name': ref.source_name, 'url': ref.url, 'short_description': ref.short_description}
+            for ref in topic.references.all()
+        ],
+    }
+
+
+def topic_markdown_path(topic):
+    return f'{topic.subject.slug}/{topic.slug}.md'
+
+
+def topic_markdown(topic):
+    """
+    Front matter plus the body. The body stays CKEditor HTML (valid Markdown), and
+    `format: html` tells import_content not to convert it again.
+    """
+    record = topic_record(topic)
+    meta = [
+        f"{key}: {record[key]}"
+        for key in ('title', 'slug', 'subject', 'author', 'status', 'difficulty', 'created_at', 'updated_at')
+    ]
+    meta.append('format: html')
+    if record['references']:
+        meta.append(f"references: {json.dumps(record['references'], ensure_ascii=False)}")
+    return '---\n' + '\n'.join(meta) + '\n---\n' + record['content'] + '\n'
+
+
+# --- STREAM WRITERS (each yields bytes) ---
+
+def stream_jsonl(topics):
+    for topic in topics:
+        yield (json.dumps(topic_record(topic), ensure_ascii=False) + '\n').encode()
+
+
+class _ZipSink:
+    """Write-only, unseekable file object; zipfile falls back to data descriptors for it."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(topics):
+    """A zip of `<subject>/<topic>.md` files, handed out as each member is compressed."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for topic in topics:
+            info = zipfile.ZipInfo(topic_markdown_path(topic), date_time=topic.updated_at.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, topic_markdown(topic))
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    yield sink.drain()
+
+
+STREAM_WRITERS = {'jsonl': stream_jsonl, 'zip': stream_zip}
+
+
+async def astream(chunks):
+    """
+    A writer's output as an async iterator, for ASGI: Django list()s a sync one in
+    full before sending any of it. Chunks are produced one at a time in the
+    thread-sensitive worker thread, so the ORM cursor stays on one connection.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # A download abandoned halfway still releases its cursor
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close)()
@@ -0,0 +1,288 @@
+import json
+import logging
+import posixpath
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Resized WebP copies live next to each other under this prefix, together with a
+# JSON sidecar that is written last: once the sidecar exists every variant does.
+VARIANTS_DIR = 'variants'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+RERENDER_CHUNK = 100
+SIDECAR_CACHE_SIZE = 2048
+# A missing sidecar may appear once the worker finishes, so misses are only
+# trusted this long; they still spare every render of the page a storage read.
+SIDECAR_MISS_SECONDS = 30
+
+_pool = None
+_pool_lock = Lock()
+# Names queued or being processed, so a burst of identical uploads encodes once
+_in_flight = set()
+# name -> (sidecar or None, expiry of a miss), least recently used first
+_sidecars = OrderedDict()
+_sidecars_lock = Lock()
+
+
+def media_storage():
+    return storages['default']
+
+
+def _variant_base(name):
+    stem, _ = posixpath.splitext(name)
+    return posixpath.join(VARIANTS_DIR, stem)
+
+
+def sidecar_name(name):
+    return f'{_variant_base(name)}.json'
+
+
+def is_image_name(name):
+    return posixpath.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_widths(width):
+    """Target widths for an image `width` pixels wide; never upscales."""
+    widths = {w for w in settings.IMAGE_VARIANT_WIDTHS if w < width}
+    widths.add(min(width, max(settings.IMAGE_VARIANT_WIDTHS)))
+    return sorted(widths)
+
+
+# --- VARIANT GENERATION ---
+
+def generate_variants(name, storage=None):
+    """
+    Write WebP copies of the stored image `name` at every variant width, then its
+    sidecar. Returns the sidecar dict, or None for files Pillow can't re-encode.
+    """
+    storage = storage or media_storage()
+    sidecar = sidecar_name(name)
+    if storage.exists(sidecar):
+        data = _read_sidecar(name, storage)
+        _remember_sidecar(name, data)
+        return data
+
+    try:
+        with storage.open(name) as handle:
+            image = Image.open(handle)
+            if getattr(image, 'is_animated', False):
+                # Re-encoding would drop every frame but the first
+                return None
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning("Skipping image variants for %s: not a readable image", name)
+        return None
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    width, height = image.size
+    variants = []
+    base = _variant_base(name)
+    for target in variant_widths(width):
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS,
+        )
+        buffer = BytesIO()
+        resized.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4)
+        variant = f'{base}-{target}.webp'
+        if storage.exists(variant):
+            storage.delete(variant)
+        storage.save(variant, ContentFile(buffer.getvalue()))
+        variants.append({'name': variant, 'width': target})
+
+    data = {'width': width, 'height': height, 'webp': variants}
+    if storage.exists(sidecar):
+        storage.delete(sidecar)
+    storage.save(sidecar, ContentFile(json.dumps(data).encode()))
+    # Topics re-rendered next in this process see the variants straight away
+    _remember_sidecar(name, data)
+    return data
+
+
+def _cached_sidecar(name):
+    """(found, sidecar or None) from the in-process cache."""
+    with _sidecars_lock:
+        entry = _sidecars.get(name)
+        if entry is None:
+            return False, None
+        data, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del _sidecars[name]
+            return False, None
+        _sidecars.move_to_end(name)
+        return True, data
+
+
+def _remember_sidecar(name, data):
+    expires = None if data is not None else time.monotonic() + SIDECAR_MISS_SECONDS
+    with _sidecars_lock:
+        _sidecars[name] = (data, expires)
+        _sidecars.move_to_end(name)
+        while len(_sidecars) > SIDECAR_CACHE_SIZE:
+            _sidecars.popitem(last=False)
+
+
+def _read_sidecar(name, storage):
+    try:
+        with storage.open(sidecar_name(name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def load_sidecar(name, storage=None):
+    found, data = _cached_sidecar(name)
+    if not found:
+        data = _read_sidecar(name, storage or media_storage())
+        _remember_sidecar(name, data)
+    return data
+
+
+def media_name(url):
+    """The storage name behind a MEDIA_URL url, or None for anything else."""
+    prefix = settings.MEDIA_URL
+    if not url or not prefix or not url.startswith(prefix):
+        return None
+    name = url[len(prefix):].split('?', 1)[0].split('#', 1)[0]
+    if not name or '..' in name.split('/'):
+        return None
+    return name
+
+
+def variants_for_url(url):
+    """Sidecar data for an uploaded image referenced by `url`, once its variants exist."""
+    name = media_name(url)
+    if name is None or not is_image_name(name):
+        return None
+    data = load_sidecar(name)
+    if data is None:
+        return None
+    storage = media_storage()
+    return {
+        'width': data['width'],
+        'height': data['height'],
+        'webp': [(storage.url(v['name']), v['width']) for v in data['webp']],
+    }
+
+
+def iter_media_images(storage=None, directory=''):
+    """Every stored image outside the variants directory."""
+    storage = storage or media_storage()
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in sorted(files):
+        name = posixpath.join(directory, filename)
+        if is_image_name(name):
+            yield name
+    for sub in sorted(directories):
+        if not directory and sub == VARIANTS_DIR:
+            continue
+        yield from iter_media_images(storage, posixpath.join(directory, sub))
+
+
+def _generate(name):
+    return name, generate_variants(name)
+
+
+def generate_many(names, workers):
+    """Yield (name, sidecar or None) for every image, in a process pool when workers > 1."""
+    if workers <= 1 or len(names) < 2:
+        for name in names:
+            yield _generate(name)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_generate, names)
+
+
+# --- BACKGROUND PROCESSING ---
+# Uploads return as soon as the original is stored. With JOBS_ASYNC the work is
+# queued like any other job; otherwise a small in-process thread pool does the encoding
+# (Pillow releases the GIL while resizing and encoding).
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants',
+            )
+        return _pool
+
+
+def schedule_variants(name):
+    if not is_image_name(name) or _cached_sidecar(name)[1] is not None:
+        return
+    with _pool_lock:
+        if name in _in_flight:
+            return
+        _in_flight.add(name)
+    if settings.JOBS_ASYNC:
+        from .jobs import enqueue
+        # Survives restarts and gets retries; `name` is in flight only until queued
+        enqueue('image_variants', {'name': name}, key=f'variants:{name}')
+        with _pool_lock:
+            _in_flight.discard(name)
+    elif settings.IMAGE_VARIANTS_ASYNC:
+        _executor().submit(_process_upload, name)
+    else:
+        _process_upload(name)
+
+
+def _process_upload(name):
+    from django.db import close_old_connections
+
+    try:
+        if generate_variants(name) is not None:
+            rerender_topics_using([name])
+    except Exception:
+        logger.exception("Generating image variants for %s failed", name)
+    finally:
+        with _pool_lock:
+            _in_flight.discard(name)
+        close_old_connections()
+
+
+def rerender_topics_using(names):
+    """
+    Re-render stored HTML of topics that embed any of these uploads, for a topic
+    saved before its images finished processing. Returns the number re-rendered.
+    """
+    from django.db.models import Q
+
+    from .models import Topic
+    from .signals import refresh_public_topics
+
+    storage = media_storage()
+    urls = [storage.url(name) for name in names]
+    topics = {}
+    # One LIKE per url; chunked to stay well inside SQLite's expression depth limit
+    for start in range(0, len(urls), RERENDER_CHUNK):
+        query = Q()
+        for url in urls[start:start + RERENDER_CHUNK]:
+            query |= Q(content__contains=url)
+        for topic in Topic.objects.filter(query).only(
+            'pk', 'content', 'content_html', 'render_version', 'subject_id', 'status',
+        ):
+            topics[topic.pk] = topic
+    if not topics:
+        return 0
+    for topic in topics.values():
+        topic.render()
+    # bulk_update skips save(), so updated_at is left alone
+    Topic.objects.bulk_update(topics.values(), ['content_html', 'render_version'], batch_size=200)
+    refresh_public_topics({topic.subject_id for topic in topics.values() if topic.status == 'published'})
+    return len(topics)
@@ -0,0 +1,237 @@
+import csv
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import search
+from .markup import markdown_to_html, split_front_matter
+from .models import Reference, Subject, Topic
+from .rendering import RENDER_PIPELINE_VERSION, render_content
+
+STATUSES = {value for value, _ in Topic.STATUS_CHOICES}
+DIFFICULTIES = {value for value, _ in Topic.DIFFICULTY_CHOICES}
+SLUG_MAX_LENGTH = Topic._meta.get_field('slug').max_length
+
+
+class ImportRecordError(ValueError):
+    """A single record can't be imported; the rest of the batch carries on."""
+
+
+# --- READERS ---
+# Each yields (position, record) where position is what a person needs to find
+# the record again (line number or file name) and record is a dict, or the
+# exception raised while parsing it.
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield f'line {line_number}', json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield f'line {line_number}', ImportRecordError(f"invalid JSON ({exc.msg})")
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        # Counted in records, not lines: cells may span several lines
+        for record_number, row in enumerate(csv.DictReader(handle), start=1):
+            yield f'record {record_number}', row
+
+
+def read_markdown_dir(path, default_subject=None):
+    """`<subject>/<topic>.md` files; front matter may override title, subject, status, etc."""
+    root = Path(path)
+    for file in sorted(root.rglob('*.md')):
+        relative = file.relative_to(root)
+        try:
+            meta, body = split_front_matter(file.read_text(encoding='utf-8'))
+        except UnicodeDecodeError:
+            yield str(relative), ImportRecordError("not UTF-8")
+            continue
+        if 'title' not in meta:
+            lines = body.lstrip().splitlines()
+            if lines and lines[0].startswith('# '):
+                meta['title'] = lines[0][2:].strip()
+                body = '\n'.join(lines[1:])
+            else:
+                meta['title'] = file.stem.replace('-', ' ').replace('_', ' ').strip().capitalize()
+        if 'subject' not in meta:
+            meta['subject'] = relative.parts[0] if len(relative.parts) > 1 else default_subject
+        # export_content writes the stored HTML as the body and marks it `format: html`
+        body_field = 'content' if meta.get('format') == 'html' else 'markdown'
+        yield str(relative), {**meta, body_field: body}
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'markdown': read_markdown_dir}
+
+
+def detect_format(path):
+    path = Path(path)
+    if path.is_dir():
+        return 'markdown'
+    return {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}.get(path.suffix.lower())
+
+
+# --- NORMALISING ---
+
+def _text(record, field):
+    # JSON can hold numbers, lists or objects where text is expected
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ImportRecordError(f"{field} must be a string")
+    return value
+
+
+def _references(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ImportRecordError("references must be a JSON list")
+    if not isinstance(value, list):
+        raise ImportRecordError("references must be a list")
+    references = []
+    for entry in value:
+        if not isinstance(entry, dict) or not _text(entry, 'url'):
+            raise ImportRecordError("every reference needs a url")
+        references.append({
+            'source_name': (_text(entry, 'source_name') or _text(entry, 'name') or entry['url'])[:100],
+            'url': entry['url'],
+            'short_description': _text(entry, 'short_description')[:255],
+        })
+    return references
+
+
+def normalize(record, default_author, default_status):
+    """Validate one raw record and return the fields the importer needs."""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ImportRecordError("not an object")
+    title = _text(record, 'title').strip()
+    subject = _text(record, 'subject').strip()
+    if not title:
+        raise ImportRecordError("missing title")
+    if not subject:
+        raise ImportRecordError("missing subject")
+    content = _text(record, 'content')
+    if not content:
+        markdown = _text(record, 'markdown')
+        if not markdown:
+            raise ImportRecordError("missing content")
+        content = markdown_to_html(markdown)
+
+    status = (_text(record, 'status') or default_status).lower()
+    if status not in STATUSES:
+        raise ImportRecordError(f"unknown status {status!r}")
+    difficulty = (_text(record, 'difficulty') or 'Beginner').capitalize()
+    if difficulty not in DIFFICULTIES:
+        raise ImportRecordError(f"unknown difficulty {difficulty!r}")
+
+    return {
+        'title': title[:200],
+        'subject': subject,
+        'author': (_text(record, 'author') or default_author or '').strip(),
+        'slug': _text(record, 'slug').strip(),
+        'content': content,
+        'status': status,
+        'difficulty': difficulty,
+        'references': _references(record.get('references')),
+    }
+
+
+# --- WRITING ---
+
+class TopicImporter:
+    """
+    Writes normalised records with bulk inserts, one transaction per batch.
+    Subjects, authors and taken slugs are looked up once and kept for the whole run.
+    """
+
+    def __init__(self):
+        self.subjects = {}
+        self.authors = {}
+        self.created_subjects = 0
+        self._taken_slugs = None
+        self._next_suffix = {}
+
+    def _resolve_subjects(self, names):
+        wanted = {slugify(name): name for name in names if slugify(name) not in self.subjects}
+        if not wanted:
+            return
+        for subject in Subject.objects.filter(slug__in=wanted):
+            self.subjects[subject.slug] = subject
+        missing = [Subject(name=name, slug=slug) for slug, name in wanted.items() if slug not in self.subjects]
+        # bulk_create bypasses Subject.save(), which is why the slug is set above
+        for subject in Subject.objects.bulk_create(missing):
+            self.subjects[subject.slug] = subject
+        self.created_subjects += len(missing)
+
+    def _resolve_authors(self, usernames):
+        wanted = {name for name in usernames if name and name not in self.authors}
+        if wanted:
+            self.authors.update(User.objects.filter(username__in=wanted).values_list('username', 'pk'))
+
+    def allocate_slug(self, title, wanted=''):
+        """First free `slug`, `slug-2`, `slug-3`, ... checked against every slug in the table."""
+        if self._taken_slugs is None:
+            self._taken_slugs = set(Topic.objects.values_list('slug', flat=True).iterator(chunk_size=5000))
+        base = slugify(wanted or title)[:SLUG_MAX_LENGTH] or 'topic'
+        slug = base
+        suffix = self._next_suffix.get(base, 2)
+        while slug in self._taken_slugs:
+            tail = f'-{suffix}'
+            slug = f'{base[:SLUG_MAX_LENGTH - len(tail)]}{tail}'
+            suffix += 1
+        self._next_suffix[base] = suffix
+        self._taken_slugs.add(slug)
+        return slug
+
+    def import_batch(self, rows):
+        """
+        Insert `rows` (position, normalised record) in one transaction.
+        Returns (topics created, references created, [(position, error), ...]).
+        """
+        skipped = []
+        with transaction.atomic():
+            self._resolve_subjects({row['subject'] for _, row in rows})
+            self._resolve_authors({row['author'] for _, row in rows})
+
+            topics, references = [], []
+            for position, row in rows:
+                author_id = self.authors.get(row['author'])
+                if author_id is None:
+                    skipped.append((position, f"unknown author {row['author']!r}"))
+                    continue
+                # bulk_create skips Topic.save(), so render here as save() would
+                topics.append(Topic(
+                    title=row['title'],
+                    slug=self.allocate_slug(row['title'], row['slug']),
+                    subject=self.subjects[slugify(row['subject'])],
+                    author_id=author_id,
+                    content=row['content'],
+                    content_html=render_content(row['content']),
+                    render_version=RENDER_PIPELINE_VERSION,
+                    status=row['status'],
+                    difficulty=row['difficulty'],
+                ))
+                references.append(row['references'])
+
+            Topic.objects.bulk_create(topics)
+            Reference.objects.bulk_create([
+                Reference(topic=topic, **reference)
+                for topic, topic_references in zip(topics, references)
+                for reference in topic_references
+            ])
+            # ... and the post_save search indexing
+            search.index_topics(topics)
+        return len(topics), sum(len(refs) for refs in references), skipped
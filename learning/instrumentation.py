@@ -0,0 +1,103 @@
+import logging
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('learning.queries')
+
+# Innermost active QueryCounter. A context variable rather than per-connection
+# state, because async views run their queries in worker threads on other
+# connection objects, and sync_to_async() carries the context across.
+_active_counter = ContextVar('learning_query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _active_counter.get()
+    while counter is not None:
+        counter.count += 1
+        counter = counter.parent
+    return execute(sql, params, many, context)
+
+
+def _install(connection):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    _install(connection)
+
+
+connection_created.connect(_install_on_connect)
+
+
+class QueryCounter:
+    """Counts SQL statements run in the current context (including nested counters) while active."""
+
+    def __init__(self):
+        self.count = 0
+        self.parent = None
+        self._token = None
+
+    def __enter__(self):
+        # Connections opened before this module was imported missed connection_created
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self.parent = _active_counter.get()
+        self._token = _active_counter.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_counter.reset(self._token)
+
+
+def get_query_budget(view_func, signed_in=False):
+    """The budget declared with @query_budget for anonymous or signed-in requests, or None."""
+    return getattr(view_func, 'signed_in_query_budget' if signed_in else 'query_budget', None)
+
+
+def _signed_in(request):
+    # The session cookie is what brings the session, user and role lookups; checking it loads nothing
+    return settings.SESSION_COOKIE_NAME in request.COOKIES
+
+
+class QueryCountMiddleware:
+    """
+    Count queries per request and compare them with the view's @query_budget.
+    Over-budget requests are logged to `learning.queries`; with DEBUG on, every
+    response also carries an X-Query-Count header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        return self._report(request, response, counter)
+
+    async def __acall__(self, request):
+        with QueryCounter() as counter:
+            response = await self.get_response(request)
+        return self._report(request, response, counter)
+
+    def _report(self, request, response, counter):
+        match = getattr(request, 'resolver_match', None)
+        budget = get_query_budget(match.func, _signed_in(request)) if match else None
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s ran %d queries (budget %d) in view %s",
+                request.method, request.path, counter.count, budget, match.view_name,
+            )
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+        return response
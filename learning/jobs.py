@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import search
+from .models import Job, Topic
+from .rendering import RENDER_PIPELINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(name):
+    """Register a function taking the job payload under `name`."""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+# --- ENQUEUEING ---
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """
+    Queue `name` to run after the current transaction commits, so the worker
+    always sees the rows it refers to. A job with the same `key` that is still
+    queued absorbs this one. Without JOBS_ASYNC the handler runs right here
+    (tests and one-off scripts).
+    """
+    if name not in HANDLERS:
+        raise KeyError(f"Unknown job {name!r}")
+    payload = payload or {}
+    if not settings.JOBS_ASYNC:
+        HANDLERS[name](payload)
+        return
+    job = Job(name=name, payload=payload, key=key, run_after=timezone.now() + timedelta(seconds=delay))
+    transaction.on_commit(lambda: _insert(job))
+
+
+def _insert(job):
+    # INSERT OR IGNORE against the partial unique index on queued keys
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    if settings.JOBS_EMBEDDED_WORKER:
+        wake_embedded_worker()
+
+
+# --- WORKER ---
+
+def claim_jobs(limit):
+    """Lease up to `limit` due jobs to this worker, oldest first."""
+    now = timezone.now()
+    due = Job.objects.filter(Q(status='queued', run_after__lte=now) | Q(status='running', locked_until__lt=now))
+    # A plain read first: idle polls shouldn't take the write lock every request waits on
+    if not due.exists():
+        return []
+    with transaction.atomic():
+        # SQLite holds the write lock for the whole transaction (transaction_mode IMMEDIATE),
+        # so two workers can never claim the same row
+        ids = list(due.order_by('run_after', 'id').values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids).update(
+            status='running',
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOBS_LEASE_SECONDS),
+        )
+        return list(Job.objects.filter(pk__in=ids).order_by('run_after', 'id'))
+
+
+def run_job(job):
+    """Run one claimed job. Finished jobs are deleted; failures are retried with backoff."""
+    try:
+        HANDLERS[job.name](job.payload)
+    except Exception:
+        _failed(job, traceback.format_exc())
+        return False
+    else:
+        Job.objects.filter(pk=job.pk).delete()
+        return True
+    finally:
+        close_old_connections()
+
+
+def _failed(job, error):
+    if job.attempts >= job.max_attempts or job.name not in HANDLERS:
+        logger.error("Job %s #%s failed for good: %s", job.name, job.pk, error)
+        Job.objects.filter(pk=job.pk).update(status='failed', locked_until=None, last_error=error)
+        return
+    delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+    logger.warning("Job %s #%s failed, retrying in %ss", job.name, job.pk, delay)
+    try:
+        # A savepoint, so the conflict doesn't break a surrounding transaction
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', locked_until=None, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # The same work was queued again meanwhile; that job supersedes this one
+        Job.objects.filter(pk=job.pk).delete()
+
+
+# --- EMBEDDED WORKER ---
+# With JOBS_EMBEDDED_WORKER each process that queues work also drains the queue
+# from one background thread, so a plain runserver or gunicorn deployment gets
+# its rendering and indexing done without a separate `run_jobs`. Jobs are leased
+# like any other worker's, so the two can run side by side.
+
+_worker_lock = threading.Lock()
+_worker_pid = None
+_wakeup = threading.Event()
+
+
+def wake_embedded_worker():
+    global _worker_pid
+    if _worker_pid != os.getpid():
+        with _worker_lock:
+            # Also true in a forked child, whose parent's thread didn't come along
+            if _worker_pid != os.getpid():
+                _worker_pid = os.getpid()
+                threading.Thread(target=_work_forever, name='jobs', daemon=True).start()
+    _wakeup.set()
+
+
+def _work_forever():
+    while True:
+        _wakeup.wait(settings.JOBS_POLL_INTERVAL)
+        _wakeup.clear()
+        try:
+            while jobs := claim_jobs(settings.JOBS_BATCH_SIZE):
+                for job in jobs:
+                    run_job(job)
+        except Exception:
+            logger.exception("Embedded job worker failed to claim jobs")
+        finally:
+            close_old_connections()
+
+
+# --- HANDLERS ---
+
+@handler('refresh_topic')
+def refresh_topic(payload):
+    """Render a saved topic if its stored HTML is stale, then update its search entry."""
+    topic = (
+        Topic.objects.filter(pk=payload['id'])
+        .only('pk', 'title', 'status', 'content', 'render_version', 'subject_id')
+        .first()
+    )
+    if topic is None:
+        search.remove_topic(payload['id'])
+        return
+    if topic.render_version != RENDER_PIPELINE_VERSION:
+        topic.render()
+        # Only if nobody saved new content meanwhile; their own job renders that
+        rendered = Topic.objects.filter(pk=topic.pk, content=topic.content).update(
+            content_html=topic.content_html, render_version=topic.render_version,
+        )
+        if rendered and topic.status == 'published':
+            from .signals import refresh_public_topics
+
+            # Pages cached since the save still show the previous HTML
+            refresh_public_topics({topic.subject_id})
+    search.index_topic(topic)
+
+
+@handler('index_topics')
+def index_topics(payload):
+    """Add freshly published topics to the search index."""
+    search.index_topics(Topic.objects.filter(pk__in=payload['ids']).only('pk', 'title', 'status', 'content'))
+
+
+@handler('related_topics')
+def related_topics(payload):
+    """Fit published or withdrawn topics into the related-topics index (a no-op before the first build)."""
+    from .related import update_related
+
+    update_related(payload['ids'])
+
+
+@handler('image_variants')
+def image_variants(payload):
+    from .images import generate_variants, rerender_topics_using
+
+    if generate_variants(payload['name']) is not None:
+        rerender_topics_using([payload['name']])
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.models import Project, Subject, Topic
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the public read views under ASGI (async views, one event loop) with the "
+        "WSGI path (sync views on a fixed pool of worker threads). Each request is followed "
+        "by --client-delay of slow-client transfer time: a WSGI worker thread is held for "
+        "it, an ASGI server is not. Run it against a populated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=600)
+        parser.add_argument('--concurrency', type=int, default=50, help="Simultaneous clients.")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--client-delay', type=float, default=50.0, help="Milliseconds.")
+        parser.add_argument(
+            '--cached', action='store_true',
+            help="Let the page cache answer repeat URLs (by default every request renders).",
+        )
+        parser.add_argument('--run', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self._run_child(options)
+            return
+
+        results = {}
+        for mode in ('wsgi', 'asgi'):
+            env = {**os.environ, 'ASYNC_PUBLIC_VIEWS': str(mode == 'asgi')}
+            # The URLconf picks sync or async views at import, so each path gets its own process
+            child = subprocess.run(
+                [sys.executable, sys.argv[0], 'bench_asgi', '--run', mode,
+                 '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+                 '--threads', str(options['threads']), '--client-delay', str(options['client_delay']),
+                 *(['--cached'] if options['cached'] else [])],
+                env=env, capture_output=True, text=True,
+            )
+            if child.returncode:
+                raise CommandError(f"{mode} run failed:\n{child.stderr}")
+            results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} clients, "
+            f"{options['threads']} WSGI threads, {options['client_delay']:.0f}ms client delay"
+        )
+        self.stdout.write(f"  {'':<5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+        for mode, result in results.items():
+            p50, p95, p99 = (_percentile(result['latencies'], q) for q in (50, 95, 99))
+            self.stdout.write(
+                f"  {mode:<5} {result['requests'] / result['elapsed']:>8.0f} "
+                f"{p50:>6.0f}ms {p95:>6.0f}ms {p99:>6.0f}ms {result['errors']:>7}"
+            )
+
+    # --- CHILD PROCESS ---
+
+    def _urls(self, cached):
+        topics = list(Topic.objects.filter(status='published').select_related('subject')[:50])
+        subjects = list(Subject.objects.filter(is_active=True)[:10])
+        projects = list(Project.objects.all()[:10])
+        if not topics:
+            raise CommandError("No published topics to request; seed or import some content first.")
+        urls = (
+            ['/', '/search/?q=' + topics[0].title.split()[0]]
+            + [subject.get_absolute_url() for subject in subjects]
+            + [topic.get_absolute_url() for topic in topics]
+            + [f'/projects/{project.pk}/' for project in projects]
+        )
+        for index, url in enumerate(cycle(urls)):
+            if cached:
+                yield url
+            else:
+                # A unique query string misses the page cache, so every request renders
+                yield f"{url}{'&' if '?' in url else '?'}bench={index}"
+
+    def _run_child(self, options):
+        urls = list(islice(self._urls(options['cached']), options['requests']))
+        delay = options['client_delay'] / 1000
+        # What the test clients send as Host (the test runner allows it the same way)
+        settings.ALLOWED_HOSTS.append('testserver')
+        if options['run'] == 'wsgi':
+            result = self._run_wsgi(urls, options['concurrency'], options['threads'], delay)
+        else:
+            result = asyncio.run(self._run_asgi(urls, options['concurrency'], delay))
+        self.stdout.write(json.dumps(result))
+
+    def _run_wsgi(self, urls, concurrency, threads, delay):
+        from django.test import Client
+
+        local = threading.local()
+        latencies, errors = [], []
+
+        def serve(url):
+            # Runs on one of the `threads` workers, which queue requests first come, first served
+            client = getattr(local, 'client', None) or Client()
+            local.client = client
+            response = client.get(url)
+            time.sleep(delay)  # the worker streams the body to a slow client
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=threads) as server:
+            def request(url):
+                started = time.perf_counter()
+                status = server.submit(serve, url).result()
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors.append(url)
+
+            request(urls[0])  # warm up imports and caches
+            latencies.clear()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                list(clients.map(request, urls))
+            elapsed = time.perf_counter() - started
+        return {'requests': len(urls), 'elapsed': elapsed, 'latencies': latencies, 'errors': len(errors)}
+
+    async def _run_asgi(self, urls, concurrency, delay):
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        latencies, errors = [], []
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+
+        async def reader():
+            while not queue.empty():
+                url = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(url)
+                await asyncio.sleep(delay)  # the server awaits the slow client, no thread held
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors.append(url)
+
+        await client.get(urls[0])  # warm up
+        started = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(concurrency)))
+        return {
+            'requests': len(urls), 'elapsed': time.perf_counter() - started,
+            'latencies': latencies, 'errors': len(errors),
+        }
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
@@ -0,0 +1,132 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE topic (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX topic_subject_idx ON topic (subject_id, id);
+"""
+
+READ_SQL = 'SELECT id, title, content FROM topic WHERE subject_id = ? ORDER BY id DESC LIMIT 20'
+WRITE_SQL = 'UPDATE topic SET content = ?, updated_at = ? WHERE id = ?'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent reads and writes against the stock SQLite setup "
+        "(rollback journal, a new connection per request) and our tuned connection settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--rows', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        init_command = settings.DATABASES['default'].get('OPTIONS', {}).get('init_command', '')
+        pragmas = [cmd.strip() for cmd in init_command.split(';') if cmd.strip()]
+
+        self.stdout.write(
+            f"{options['threads']} threads, {options['write_ratio']:.0%} writes, "
+            f"{options['seconds']:.0f}s per run"
+        )
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, tuned in (('stock', False), ('tuned', True)):
+                path = Path(tmp) / f'{label}.sqlite3'
+                _create_database(path, options['rows'])
+                results[label] = _run(path, pragmas if tuned else [], tuned, options)
+                self._report(label, results[label], options['seconds'])
+
+        stock, tuned = results['stock']['ops'], results['tuned']['ops']
+        if stock:
+            self.stdout.write(self.style.SUCCESS(f"Throughput: {tuned / stock:.1f}x the stock configuration."))
+
+    def _report(self, label, result, seconds):
+        latencies = sorted(result['latencies']) or [0.0]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"  {label:<6} {result['ops'] / seconds:>9.0f} ops/s  "
+            f"reads={result['reads']:<7} writes={result['writes']:<6} "
+            f"locked={result['errors']:<5} p95={p95 * 1000:.1f}ms"
+        )
+
+
+def _create_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    body = 'lorem ipsum ' * 200
+    conn.executemany(
+        'INSERT INTO topic (id, subject_id, title, content, updated_at) VALUES (?, ?, ?, ?, ?)',
+        ((i, i % 20, f'Topic {i}', body, time.time()) for i in range(1, rows + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _run(path, pragmas, tuned, options):
+    """Hammer `path` from several threads for a fixed time and tally what got through."""
+    totals = {'ops': 0, 'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + options['seconds']
+
+    def connect():
+        # isolation_level=None: explicit BEGIN/COMMIT, as Django does in autocommit mode
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for pragma in pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {'ops': 0, 'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+        # Tuned: one persistent connection per thread (CONN_MAX_AGE); stock: one per request
+        conn = connect() if tuned else None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            request_conn = conn or connect()
+            try:
+                if rng.random() < options['write_ratio']:
+                    request_conn.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+                    request_conn.execute(READ_SQL, (rng.randrange(20),)).fetchall()
+                    request_conn.execute(WRITE_SQL, ('edited ' * 100, time.time(), rng.randint(1, options['rows'])))
+                    request_conn.execute('COMMIT')
+                    local['writes'] += 1
+                else:
+                    request_conn.execute(READ_SQL, (rng.randrange(20),)).fetchall()
+                    local['reads'] += 1
+                local['ops'] += 1
+                local['latencies'].append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                local['errors'] += 1
+                if request_conn.in_transaction:
+                    request_conn.execute('ROLLBACK')
+            finally:
+                if conn is None:
+                    request_conn.close()
+        if conn is not None:
+            conn.close()
+        with lock:
+            for key in ('ops', 'reads', 'writes', 'errors'):
+                totals[key] += local[key]
+            totals['latencies'].extend(local['latencies'])
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return totals
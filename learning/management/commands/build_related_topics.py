@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learning.related import build_related
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the related topics of every published topic from TF-IDF similarity "
+        "and save the index that publishing updates incrementally. Run it periodically "
+        "(e.g. nightly) so the vocabulary follows the content."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=settings.RELATED_TOPICS_COUNT, help="Links per topic.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        topics, terms, links = build_related(max(options['count'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            f"Linked {topics} topic(s) with {links} related link(s) over {terms} term(s) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,77 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from learning.static_site import (
+    copy_file, copy_tree, load_manifest, output_path, plan_pages, render_pages, save_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render the public site (home, subject listings, topic and project pages) into a "
+        "directory any file server can serve. Only pages whose data changed since the last "
+        "build are rendered again. Listings include their first page only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default=str(Path(settings.BASE_DIR) / 'site'))
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--all', action='store_true', help="Re-render every page.")
+
+    def handle(self, *args, **options):
+        root = Path(options['output'])
+        root.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+
+        pages = plan_pages()
+        previous = {} if options['all'] else load_manifest(root)
+        stale = [
+            path for path, digest in pages.items()
+            if previous.get(path) != digest or not output_path(root, path).is_file()
+        ]
+
+        manifest = {path: digest for path, digest in previous.items() if path in pages}
+        failed = 0
+        for path, status, content in render_pages(stale, options['workers']):
+            if status != 200:
+                self.stderr.write(f"Skipped {path}: HTTP {status}")
+                manifest.pop(path, None)
+                failed += 1
+                continue
+            target = output_path(root, path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+            manifest[path] = pages[path]
+
+        removed = 0
+        for path in previous.keys() - pages.keys():
+            # Unpublished or deleted since the last build
+            output_path(root, path).unlink(missing_ok=True)
+            removed += 1
+        save_manifest(root, manifest)
+
+        static_copied = self._copy_static(root)
+        media_copied = copy_tree(settings.MEDIA_ROOT, root / settings.MEDIA_URL.strip('/'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(stale) - failed} page(s) rendered, {len(pages) - len(stale)} unchanged, "
+            f"{removed} removed, {static_copied + media_copied} file(s) copied "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def _copy_static(self, root):
+        target = root / settings.STATIC_URL.strip('/')
+        static_root = Path(settings.STATIC_ROOT or '')
+        # After collectstatic the pages link the hashed names, which only exist in STATIC_ROOT
+        if settings.STATIC_ROOT and static_root.is_dir():
+            return copy_tree(static_root, target)
+        copied = 0
+        for finder in finders.get_finders():
+            for path, storage in finder.list([]):
+                copied += copy_file(Path(storage.path(path)), target / path)
+        return copied
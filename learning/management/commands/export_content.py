@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.exporting import (
+    STREAM_WRITERS, export_topics, iter_export, topic_markdown, topic_markdown_path,
+)
+from learning.models import Subject
+
+
+class Command(BaseCommand):
+    help = (
+        "Export topics as JSONL, a zip of Markdown files, or a directory of Markdown files. "
+        "Rows are streamed in chunks, so memory use doesn't grow with the amount of content."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['jsonl', 'zip', 'markdown'], default='jsonl')
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help="File to write (directory for --format markdown); '-' writes to stdout.",
+        )
+        parser.add_argument('--subject', help="Only export this subject (slug).")
+        parser.add_argument('--all', action='store_true', help="Include drafts, pending and rejected topics.")
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        subject = None
+        if options['subject']:
+            subject = Subject.objects.filter(slug=options['subject']).first()
+            if subject is None:
+                raise CommandError(f"No subject with slug {options['subject']!r}.")
+        topics = iter_export(export_topics(subject, options['all']), options['chunk_size'])
+        self.count = 0
+
+        if options['format'] == 'markdown':
+            if options['output'] == '-':
+                raise CommandError("--format markdown writes one file per topic; pass --output DIR.")
+            self._write_markdown(topics, Path(options['output']))
+        else:
+            self._write_stream(STREAM_WRITERS[options['format']](self._counted(topics)), options['output'])
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {self.count} topic(s)."))
+
+    def _counted(self, topics):
+        for topic in topics:
+            self.count += 1
+            yield topic
+
+    def _write_stream(self, chunks, output):
+        if output == '-':
+            target = sys.stdout.buffer
+            for chunk in chunks:
+                target.write(chunk)
+            target.flush()
+            return
+        with open(output, 'wb') as target:
+            for chunk in chunks:
+                target.write(chunk)
+
+    def _write_markdown(self, topics, root):
+        for topic in self._counted(topics):
+            path = root / topic_markdown_path(topic)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(topic_markdown(topic), encoding='utf-8')
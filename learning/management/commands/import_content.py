@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+
+from learning.importer import READERS, ImportRecordError, TopicImporter, detect_format, normalize
+from learning.models import Topic
+from learning.signals import refresh_public_content
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream topics (with references) from JSONL, CSV or a directory of Markdown files "
+        "into the database in batched bulk inserts. Progress is checkpointed after every "
+        "batch so a failed run can continue with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="A .jsonl/.csv file or a directory of <subject>/<topic>.md files.")
+        parser.add_argument('--format', choices=sorted(READERS), help="Defaults to the file extension.")
+        parser.add_argument('--author', help="Username for records without an `author`.")
+        parser.add_argument(
+            '--status', default='draft', choices=[value for value, _ in Topic.STATUS_CHOICES],
+            help="Status for records without a `status` (default: draft).",
+        )
+        parser.add_argument('--subject', help="Subject for Markdown files outside a subject directory.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint).")
+        parser.add_argument('--resume', action='store_true', help="Skip the records a previous run committed.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path']).resolve()
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options['format'] or detect_format(path)
+        if fmt is None:
+            raise CommandError("Can't tell the format from the file name; pass --format.")
+        if options['author'] and not User.objects.filter(username=options['author']).exists():
+            raise CommandError(f"No user named {options['author']!r}.")
+
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+        done = self._load_checkpoint(checkpoint, path) if options['resume'] else 0
+
+        reader = READERS[fmt]
+        records = reader(path, options['subject']) if fmt == 'markdown' else reader(path)
+        if done:
+            self.stdout.write(f"Resuming after {done} record(s).")
+            records = islice(records, done, None)
+
+        importer = TopicImporter()
+        batch_size = options['batch_size']
+        created = references = skipped = processed = 0
+        started = time.perf_counter()
+
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            rows = []
+            for position, record in batch:
+                try:
+                    rows.append((position, normalize(record, options['author'], options['status'])))
+                except ImportRecordError as exc:
+                    self.stderr.write(f"Skipped {position}: {exc}")
+                    skipped += 1
+            try:
+                batch_created, batch_references, batch_skipped = importer.import_batch(rows)
+            except Exception as exc:
+                raise CommandError(
+                    f"Batch after record {done} failed ({exc}); nothing from it was saved. "
+                    f"Fix the data and rerun with --resume."
+                ) from exc
+            for position, error in batch_skipped:
+                self.stderr.write(f"Skipped {position}: {error}")
+
+            created += batch_created
+            references += batch_references
+            skipped += len(batch_skipped)
+            processed += len(batch)
+            done += len(batch)
+            self._save_checkpoint(checkpoint, path, done)
+            if options['verbosity'] >= 1:
+                rate = processed / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(f"  {done} records read, {created} topics created ({rate:.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+        if created:
+            # Bulk inserts fire no signals: retire every cached public page once, here
+            refresh_public_content()
+        checkpoint.unlink(missing_ok=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} topic(s) and {references} reference(s) "
+            f"({importer.created_subjects} new subject(s), {skipped} skipped) "
+            f"in {elapsed:.1f}s, {processed / max(elapsed, 1e-9):.0f} rows/s."
+        ))
+
+    def _load_checkpoint(self, checkpoint, source):
+        if not checkpoint.exists():
+            return 0
+        state = json.loads(checkpoint.read_text())
+        if state.get('source') != str(source):
+            raise CommandError(f"{checkpoint} belongs to {state.get('source')}, not {source}.")
+        return state['records']
+
+    def _save_checkpoint(self, checkpoint, source, records):
+        # Written after the batch commits; replace() so a crash never leaves half a file
+        tmp = checkpoint.with_name(checkpoint.name + '.tmp')
+        tmp.write_text(json.dumps({'source': str(source), 'records': records}))
+        os.replace(tmp, checkpoint)
@@ -0,0 +1,36 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning.images import (
+    generate_many, iter_media_images, media_storage, rerender_topics_using, sidecar_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized WebP variants for uploaded images that don't have them yet "
+        "(e.g. uploads from before the image pipeline), then re-render the topics using them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        storage = media_storage()
+        pending = [name for name in iter_media_images(storage) if not storage.exists(sidecar_name(name))]
+
+        processed, skipped = [], 0
+        for name, data in generate_many(pending, options['workers']):
+            if data is None:
+                skipped += 1
+            else:
+                processed.append(name)
+
+        rerendered = rerender_topics_using(processed) if processed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(processed)} image(s) processed, {skipped} skipped, "
+            f"{rerendered} topic(s) re-rendered in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from learning.models import TopicRevision
+from learning.revisions import prune_topic
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete old topic revisions, keeping the newest --keep per topic plus the last "
+        "reviewed one. Kept revisions stay fully reconstructable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=50)
+
+    def handle(self, *args, **options):
+        keep = max(options['keep'], 1)
+        topic_ids = (
+            TopicRevision.objects.values('topic_id').annotate(total=Count('pk'))
+            .filter(total__gt=keep).values_list('topic_id', flat=True)
+        )
+        deleted = sum(prune_topic(topic_id, keep) for topic_id in list(topic_ids))
+
+        stored = TopicRevision.objects.aggregate(rows=Count('pk'), stored=Sum(Length('data')), content=Sum('size'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} revision(s). {stored['rows']} left, storing {stored['stored'] or 0:,} bytes "
+            f"for {stored['content'] or 0:,} bytes of content."
+        ))
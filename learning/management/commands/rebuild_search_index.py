@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from all published topics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search needs SQLite with FTS5; run `migrate` first.")
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} published topic(s)."))
@@ -0,0 +1,50 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from learning.routers import REPLICA
+from learning.signals import refresh_public_content
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the read replica file (REPLICA_DB_PATH) "
+        "using SQLite's online backup API, then retire caches built from the old copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help="Pages copied per step; readers of the replica get the lock between steps.",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError("No read replica configured; set REPLICA_DB_PATH.")
+        primary, replica = settings.DATABASES[DEFAULT_DB_ALIAS], settings.DATABASES[REPLICA]
+        if not all(db['ENGINE'] == 'django.db.backends.sqlite3' for db in (primary, replica)):
+            raise CommandError("refresh_replica only copies SQLite databases.")
+
+        started = time.perf_counter()
+        source = sqlite3.connect(primary['NAME'])
+        # Copy straight into the live file: open replica connections see the new data
+        # on their next read instead of holding on to a replaced inode.
+        target = sqlite3.connect(replica['NAME'], timeout=30)
+        try:
+            source.backup(target, pages=options['pages'])
+            page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        connections[REPLICA].close()
+
+        # Pages, outlines and the nav list rendered from the old copy may predate writes
+        # that were already invalidated on the primary
+        refresh_public_content()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {page_count} pages to {replica['NAME']} in {time.perf_counter() - started:.2f}s."
+        ))
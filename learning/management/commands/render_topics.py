@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from learning.models import Topic
+from learning.rendering import RENDER_PIPELINE_VERSION
+
+
+class Command(BaseCommand):
+    help = "Re-render stored topic HTML that is older than the current render pipeline version."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-render every topic, not just stale ones.")
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        topics = Topic.objects.only('pk', 'content', 'content_html', 'render_version').order_by('pk')
+        if not options['all']:
+            topics = topics.filter(render_version__lt=RENDER_PIPELINE_VERSION)
+
+        total = 0
+        batch = []
+        for topic in topics.iterator(chunk_size=batch_size):
+            topic.render()
+            batch.append(topic)
+            if len(batch) >= batch_size:
+                # bulk_update skips save(), so updated_at is left alone
+                Topic.objects.bulk_update(batch, ['content_html', 'render_version'])
+                total += len(batch)
+                batch = []
+        if batch:
+            Topic.objects.bulk_update(batch, ['content_html', 'render_version'])
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {total} topic(s) with pipeline v{RENDER_PIPELINE_VERSION}."
+        ))
@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learning.jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (rendering, search indexing, image variants) with a "
+        "thread pool. Several workers can run side by side; each job is leased to one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOBS_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=settings.JOBS_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due instead of polling.")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='jobs') as pool:
+            try:
+                while True:
+                    jobs = claim_jobs(options['batch_size'])
+                    if not jobs:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    for ok in pool.map(run_job, jobs):
+                        done += ok
+                        failed += not ok
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f"{done} job(s) done, {failed} failed."))
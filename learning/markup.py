@@ -0,0 +1,120 @@
+import re
+from html import escape
+
+try:
+    import markdown as _markdown
+except ImportError:  # Optional: the small converter below covers what our notes use
+    _markdown = None
+
+_FENCE_RE = re.compile(r'^(```|~~~)\s*([\w+#-]*)\s*$')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_BULLET_RE = re.compile(r'^\s*[-*+]\s+(.*)$')
+_NUMBERED_RE = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+_BOLD_RE = re.compile(r'(\*\*|__)(.+?)\1')
+_ITALIC_RE = re.compile(r'(?<![\w*])([*_])(?!\s)(.+?)(?<!\s)\1(?![\w*])')
+
+
+def split_front_matter(text):
+    """Split `---`-delimited `key: value` front matter from a Markdown document."""
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != '---':
+        return {}, text
+    for index, line in enumerate(lines[1:], start=1):
+        if line.strip() == '---':
+            meta = {}
+            for entry in lines[1:index]:
+                key, sep, value = entry.partition(':')
+                if sep:
+                    meta[key.strip().lower()] = value.strip().strip('"\'')
+            return meta, '\n'.join(lines[index + 1:])
+    return {}, text
+
+
+def _inline(text):
+    # Code spans are cut out first so their contents are never formatted
+    parts = _INLINE_CODE_RE.split(text)
+    out = []
+    for index, part in enumerate(parts):
+        if index % 2:
+            out.append(f'<code>{escape(part, quote=False)}</code>')
+            continue
+        part = escape(part, quote=False)
+        part = _LINK_RE.sub(lambda m: f'<a href="{m.group(2).replace(chr(34), "&quot;")}">{m.group(1)}</a>', part)
+        part = _BOLD_RE.sub(r'<strong>\2</strong>', part)
+        part = _ITALIC_RE.sub(r'<em>\2</em>', part)
+        out.append(part)
+    return ''.join(out)
+
+
+def _basic_markdown(text):
+    """Headings, paragraphs, lists, quotes, fenced code and inline formatting."""
+    out = []
+    paragraph = []
+    list_tag = None
+    code = None  # [language, lines] inside a fenced block
+
+    def flush():
+        nonlocal list_tag
+        if paragraph:
+            out.append(f'<p>{_inline(" ".join(paragraph))}</p>')
+            paragraph.clear()
+        if list_tag:
+            out.append(f'</{list_tag}>')
+            list_tag = None
+
+    for line in text.splitlines():
+        if code is not None:
+            if _FENCE_RE.match(line):
+                language, body = code
+                css = f' class="language-{escape(language)}"' if language else ''
+                out.append(f'<pre><code{css}>{escape(chr(10).join(body), quote=False)}</code></pre>')
+                code = None
+            else:
+                code[1].append(line)
+            continue
+
+        fence = _FENCE_RE.match(line)
+        heading = _HEADING_RE.match(line)
+        item = _BULLET_RE.match(line) or _NUMBERED_RE.match(line)
+        if fence:
+            flush()
+            code = [fence.group(2).lower(), []]
+        elif not line.strip():
+            flush()
+        elif heading:
+            flush()
+            level = len(heading.group(1))
+            out.append(f'<h{level}>{_inline(heading.group(2))}</h{level}>')
+        elif item:
+            tag = 'ul' if _BULLET_RE.match(line) else 'ol'
+            if paragraph or list_tag != tag:
+                flush()
+                out.append(f'<{tag}>')
+                list_tag = tag
+            out.append(f'<li>{_inline(item.group(1))}</li>')
+        elif line.startswith('>'):
+            flush()
+            out.append(f'<blockquote><p>{_inline(line.lstrip("> "))}</p></blockquote>')
+        elif re.match(r'^\s*([-*_])(\s*\1){2,}\s*$', line):
+            flush()
+            out.append('<hr>')
+        else:
+            if list_tag:
+                flush()
+            paragraph.append(line.strip())
+
+    if code is not None:
+        language, body = code
+        css = f' class="language-{escape(language)}"' if language else ''
+        out.append(f'<pre><code{css}>{escape(chr(10).join(body), quote=False)}</code></pre>')
+    flush()
+    return '\n'.join(out)
+
+
+def markdown_to_html(text):
+    """Markdown to HTML in the shape CKEditor produces (sanitised later by render_content)."""
+    if _markdown is not None:
+        return _markdown.markdown(text, extensions=['fenced_code', 'tables'])
+    return _basic_markdown(text)
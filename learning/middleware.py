@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .roles import resolve_role
+from .routers import PIN_COOKIE, replica_enabled
+
+
+class RoleMiddleware(MiddlewareMixin):
+    """Expose the user's role as `request.role`, resolved at most once per request."""
+
+    def process_request(self, request):
+        request.role = SimpleLazyObject(lambda: resolve_role(request))
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """After any write, pin the browser to the primary for REPLICA_PIN_SECONDS (read-your-own-writes)."""
+
+    def process_response(self, request, response):
+        if replica_enabled() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 60),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,47 @@
+from html import unescape
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'learning_topic_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(title, body, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+
+    Topic = apps.get_model('learning', 'Topic')
+    rows = [
+        (pk, title, ' '.join(unescape(strip_tags(content or '')).split()))
+        for pk, title, content in Topic.objects.filter(status='published').values_list('pk', 'title', 'content')
+    ]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0011_alter_topic_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 22:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0012_topic_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='topic_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['subject', 'status', 'id'], name='topic_subject_status_idx'),
+        ),
+    ]
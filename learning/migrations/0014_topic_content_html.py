@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0013_topic_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 23:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0014_topic_content_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['subject', 'status', 'updated_at'], name='topic_subject_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0016_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('reviewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='learning.topic')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('topic', 'number'), name='topic_revision_number_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 00:05
+
+import django_ckeditor_5.fields
+from django.db import migrations, models
+
+# SQLite stores a row's columns in declaration order and spills whatever does not
+# fit in the page into an overflow chain. With `content` third, reading status,
+# dates or difficulty for a list page walked every overflow page of the body.
+# Re-adding the body columns appends them to the row, after everything lists use.
+
+MOVE_BODY = (
+    'UPDATE learning_topic SET content = content_inline, content_html = content_html_inline'
+)
+RESTORE_BODY = (
+    'UPDATE learning_topic SET content_inline = content, content_html_inline = content_html'
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0017_topicrevision'),
+    ]
+
+    operations = [
+        migrations.RenameField(model_name='topic', old_name='content', new_name='content_inline'),
+        migrations.RenameField(model_name='topic', old_name='content_html', new_name='content_html_inline'),
+        migrations.AddField(
+            model_name='topic',
+            name='content',
+            field=django_ckeditor_5.fields.CKEditor5Field(default='', verbose_name='Content'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(MOVE_BODY, RESTORE_BODY),
+        # Dropped by hand so that migrating backwards can re-add them with a default
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'ALTER TABLE learning_topic DROP COLUMN {column}',
+                    f"ALTER TABLE learning_topic ADD COLUMN {column} text NOT NULL DEFAULT ''",
+                )
+                for column in ('content_inline', 'content_html_inline')
+            ],
+            state_operations=[
+                migrations.RemoveField(model_name='topic', name='content_inline'),
+                migrations.RemoveField(model_name='topic', name='content_html_inline'),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0018_topic_body_columns_last'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedTopic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='learning.topic')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='learning.topic')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('topic', 'rank'), name='related_topic_rank_unique')],
+            },
+        ),
+    ]
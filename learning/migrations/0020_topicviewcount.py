@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 01:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0019_relatedtopic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicViewCount',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_count', serialize=False, to='learning.topic')),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='learning.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', '-views'], name='topic_views_subject_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 02:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0020_topicviewcount'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='topic',
+            name='topic_subject_updated_idx',
+        ),
+    ]
@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django_ckeditor_5.fields import CKEditor5Field
+from .rendering import render_content, RENDER_PIPELINE_VERSION
 
 class Profile(models.Model):
     ROLE_CHOICES = [
@@ -54,6 +57,14 @@ class Category(models.Model):
     def __str__(self):
         return f"{self.subject.name} → {self.name}"
 
+class TopicQuerySet(models.QuerySet):
+    # Article bodies: often hundreds of KB each and never shown in a list
+    BODY_FIELDS = ('content', 'content_html')
+
+    def listing(self):
+        """Topics for list pages: everything but the body columns."""
+        return self.defer(*self.BODY_FIELDS)
+
 class Topic(models.Model):
     # Professional State Machine
     STATUS_CHOICES = [
@@ -74,26 +85,127 @@ class Topic(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = CKEditor5Field('Content', config_name='default')
+    # Sanitised + highlighted copy of `content`, produced on save (see rendering.py)
+    content_html = models.TextField(blank=True, editable=False)
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     rejection_notes = models.TextField(blank=True, null=True)
     difficulty = models.CharField(max_length=50, choices=DIFFICULTY_CHOICES, default='Beginner')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TopicQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Seek pagination: home (newest first) and per-subject listings
+            models.Index(fields=['status', '-created_at', '-id'], name='topic_status_created_idx'),
+            models.Index(fields=['subject', 'status', 'id'], name='topic_subject_status_idx'),
+        ]
+
     def get_absolute_url(self):
         return reverse('topic_detail', kwargs={
             'subject_slug': self.subject.slug,
             'topic_slug': self.slug
         })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember subject and status as loaded so a save can tell what became
+        # (or stopped being) public and invalidate both old and new subject
+        instance._loaded_subject_id = instance.__dict__.get('subject_id')
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    @property
+    def rendered_content(self):
+        # Stored HTML is served even when an edit or a newer pipeline left it stale,
+        # until the refresh_topic job (or render_topics) replaces it. Only topics
+        # that were never rendered are rendered per request meanwhile.
+        if self.content_html:
+            return self.content_html
+        return render_content(self.content)
+
+    def render(self):
+        self.content_html = render_content(self.content)
+        self.render_version = RENDER_PIPELINE_VERSION
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if settings.JOBS_ASYNC:
+                # The refresh_topic job renders it after commit (see signals.topic_saved)
+                self.render_version = 0
+            else:
+                self.render()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'render_version'}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
+class TopicRevision(models.Model):
+    """
+    One saved state of a topic. The content is a zlib-compressed snapshot or a
+    compressed delta against the previous revision (see revisions.py).
+    """
+    topic = models.ForeignKey(Topic, related_name='revisions', on_delete=models.CASCADE)
+    number = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    is_snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+    # Length of the full content, so growth can be judged without decoding anything
+    size = models.PositiveIntegerField(default=0)
+    # The state a moderator approved or rejected; diffs for the next review start here
+    reviewed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'number'], name='topic_revision_number_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic_id} r{self.number}"
+
+class RelatedTopic(models.Model):
+    """
+    One precomputed "related topics" link: `related` is the `rank`-th most similar
+    published topic to `topic` (see related.py). Rebuilt by build_related_topics.
+    """
+    topic = models.ForeignKey(Topic, related_name='related_links', on_delete=models.CASCADE)
+    related = models.ForeignKey(Topic, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index the detail page reads its links through, in rank order
+            models.UniqueConstraint(fields=['topic', 'rank'], name='related_topic_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic_id} -> {self.related_id} (#{self.rank})"
+
+class TopicViewCount(models.Model):
+    """Page views of a topic, added up in each worker and flushed in batches (see popularity.py)."""
+    topic = models.OneToOneField(Topic, primary_key=True, related_name='view_count', on_delete=models.CASCADE)
+    # Copied from the topic on every flush, so a subject's most viewed topics are one index range
+    subject = models.ForeignKey(Subject, related_name='+', on_delete=models.CASCADE)
+    views = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', '-views'], name='topic_views_subject_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic_id}: {self.views} views"
+
 class Reference(models.Model):
     topic = models.ForeignKey(Topic, related_name='references', on_delete=models.CASCADE)
     source_name = models.CharField(max_length=100)
@@ -119,4 +231,37 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} | {self.title}"
\ No newline at end of file
+        return f"{self.user.username} | {self.title}"
+
+class Job(models.Model):
+    """A unit of deferred work for `manage.py run_jobs` (see jobs.py)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),  # Out of attempts; kept for inspection in the admin
+    ]
+    name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    # Only one queued job per key: enqueueing the same work again is a no-op
+    key = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # A running job whose lease expired belonged to a worker that died; it is claimed again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status='queued'), name='job_unique_queued_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import Topic
+from .revisions import mark_reviewed
+from .signals import refresh_public_topics
+
+# Moderation decisions: the only transitions out of the review queue
+TRANSITIONS = {
+    'approve': 'published',
+    'reject': 'rejected',
+}
+MAX_BATCH = 500
+
+
+class ModerationResult:
+    """What a batch did: the topics moved, and the ones someone else got to first."""
+
+    def __init__(self, changed, conflicts):
+        self.changed = changed      # [(pk, title)]
+        self.conflicts = conflicts  # [(pk, title, current status)], missing topics omitted
+
+    def __bool__(self):
+        return bool(self.changed)
+
+
+def moderate_topics(topic_ids, action, feedback=''):
+    """
+    Apply `action` to every topic in `topic_ids` that is still pending, in one transaction.
+
+    The status check is part of the UPDATE itself, so when two moderators act on
+    the same topic only the first one wins and the second gets a conflict. Public
+    caches and the search index are refreshed once for the whole batch.
+    """
+    status = TRANSITIONS[action]
+    topic_ids = list(dict.fromkeys(int(pk) for pk in topic_ids))[:MAX_BATCH]
+    with transaction.atomic():
+        # Takes the row locks where the database has them; SQLite already holds the
+        # write lock for the whole transaction (transaction_mode IMMEDIATE)
+        rows = list(
+            Topic.objects.select_for_update()
+            .filter(pk__in=topic_ids)
+            .values_list('pk', 'title', 'status', 'subject_id')
+        )
+        pending = [row for row in rows if row[2] == 'pending']
+        pending_ids = [row[0] for row in pending]
+        Topic.objects.filter(pk__in=pending_ids, status='pending').update(
+            status=status,
+            rejection_notes=feedback if action == 'reject' else '',
+            # update() skips auto_now; static site digests and related-topic catch-up rely on updated_at
+            updated_at=timezone.now(),
+        )
+        if pending:
+            # The next review of these topics diffs against what was decided on now
+            mark_reviewed(pending_ids)
+        if action == 'approve' and pending:
+            enqueue('index_topics', {'ids': pending_ids})
+            enqueue('related_topics', {'ids': pending_ids})
+            subject_ids = {row[3] for row in pending}
+            transaction.on_commit(lambda: refresh_public_topics(subject_ids))
+
+    return ModerationResult(
+        changed=[(pk, title) for pk, title, _, _ in pending],
+        conflicts=[(pk, title, current) for pk, title, current, _ in rows if current != 'pending'],
+    )
+
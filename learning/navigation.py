@@ -0,0 +1,65 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .cache import get_version, bump_version
+from .models import RelatedTopic, Topic
+
+# Lightweight stand-in for a Topic in sidebars and prev/next links
+OutlineEntry = namedtuple('OutlineEntry', ['id', 'slug', 'title'])
+RelatedEntry = namedtuple('RelatedEntry', ['subject_slug', 'slug', 'title'])
+
+OUTLINE_TIMEOUT = 60 * 60 * 24
+
+
+def outline_version_name(subject_id):
+    return f'outline:{subject_id}'
+
+
+def invalidate_outline(*subject_ids):
+    bump_version(*(outline_version_name(subject_id) for subject_id in subject_ids if subject_id))
+
+
+def subject_outline(subject_id):
+    """Published topics of a subject in reading (id) order, cached until the next publish/unpublish/delete."""
+    key = f'learning:outline:{subject_id}:{get_version(outline_version_name(subject_id))}'
+    outline = cache.get(key)
+    if outline is None:
+        rows = (
+            Topic.objects.filter(subject_id=subject_id, status='published')
+            .order_by('id')
+            .values_list('id', 'slug', 'title')
+        )
+        outline = [OutlineEntry(*row) for row in rows]
+        cache.set(key, outline, OUTLINE_TIMEOUT)
+    return outline
+
+
+def topic_navigation(topic):
+    """Return (outline, previous_entry, next_entry) for a published topic."""
+    outline = subject_outline(topic.subject_id)
+    ids = [entry.id for entry in outline]
+    index = bisect_left(ids, topic.id)
+    if index == len(ids) or ids[index] != topic.id:
+        # Published between the cache fill and now: rebuild once
+        invalidate_outline(topic.subject_id)
+        outline = subject_outline(topic.subject_id)
+        ids = [entry.id for entry in outline]
+        index = bisect_left(ids, topic.id)
+        if index == len(ids) or ids[index] != topic.id:
+            return outline, None, None
+
+    previous_entry = outline[index - 1] if index > 0 else None
+    next_entry = outline[index + 1] if index + 1 < len(outline) else None
+    return outline, previous_entry, next_entry
+
+
+def related_topics(topic):
+    """The precomputed related topics (see related.py) that are still published, best first."""
+    rows = (
+        RelatedTopic.objects.filter(topic_id=topic.pk, related__status='published')
+        .order_by('rank')
+        .values_list('related__subject__slug', 'related__slug', 'related__title')
+    )
+    return [RelatedEntry(*row) for row in rows]
@@ -0,0 +1,103 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+from .cache import get_version, bump_version
+from .pagination import STATIC_RENDER_HEADER
+from .routers import PIN_COOKIE
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+# Generation names. Every cached page is keyed on the generations it depends on,
+# so bumping one of them retires exactly the pages that render that data.
+SITE = 'pages:site'          # nav subjects: every page
+TOPICS = 'pages:topics'      # home + search listings
+PROJECTS = 'pages:projects'  # subject project lists + project pages
+
+
+def subject_pages(subject_slug):
+    """Subject listing and every topic page in it (their sidebars list the subject's topics)."""
+    return f'pages:subject:{subject_slug}'
+
+
+def invalidate_pages(*names):
+    bump_version(*names)
+
+
+def _cache_key(request, names):
+    versions = ':'.join(str(get_version(name)) for name in names)
+    # Static renders leave out the pager, so they're cached apart from live pages
+    static = STATIC_RENDER_HEADER in request.META
+    raw = f'{request.build_absolute_uri()}|{versions}|{static}'
+    return 'learning:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending flash messages are rendered into the page, so it must be built fresh
+    return len(get_messages(request)) == 0
+
+
+def _lookup(request, names):
+    """(cache key, cached response) for a cacheable request, or (None, None)."""
+    if not _is_cacheable_request(request):
+        return None, None
+    key = _cache_key(request, names)
+    # A browser pinned to the primary has just written something: rebuild the
+    # page from the primary rather than serve one rendered from the replica
+    if PIN_COOKIE in request.COOKIES:
+        return key, None
+    return key, cache.get(key)
+
+
+def _store(request, key, response):
+    if (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and len(get_messages(request)) == 0
+    ):
+        cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+
+
+def cache_public_page(scopes):
+    """
+    Serve anonymous GETs from the cache. `scopes(**view_kwargs)` lists the
+    generations the page depends on; the site-wide one is always included.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_view(request, *args, **kwargs):
+                # Session, user and cache lookups are all sync
+                key, response = await sync_to_async(_lookup)(request, [SITE, *scopes(**kwargs)])
+                if response is not None:
+                    response['X-Page-Cache'] = 'hit'
+                    return response
+                response = await view_func(request, *args, **kwargs)
+                if key is not None:
+                    await sync_to_async(_store)(request, key, response)
+                return response
+            return _async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            key, response = _lookup(request, [SITE, *scopes(**kwargs)])
+            if response is not None:
+                response['X-Page-Cache'] = 'hit'
+                return response
+            response = view_func(request, *args, **kwargs)
+            if key is not None:
+                _store(request, key, response)
+            return response
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,178 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+
+DEFAULT_PAGE_SIZE = 20
+
+# Sent by the static-site build. A static host serves `?after=` as the first
+# page again, so those renders get no cursor links (later pages need the live site).
+STATIC_RENDER_HEADER = 'HTTP_X_LEARNING_STATIC_RENDER'
+
+
+class KeysetPage:
+    """One page of a seek-paginated queryset plus the cursors around it."""
+
+    def __init__(self, request, items, keys, has_next, has_previous):
+        self.request = request
+        self.items = items
+        self.keys = keys
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return encode_cursor(self.items[-1], self.keys)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.items:
+            return encode_cursor(self.items[0], self.keys)
+        return None
+
+    def _url(self, param, cursor):
+        if STATIC_RENDER_HEADER in self.request.META:
+            return None
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[param] = cursor
+        return f"{self.request.path}?{params.urlencode()}"
+
+    @property
+    def next_url(self):
+        cursor = self.next_cursor
+        return self._url('after', cursor) if cursor else None
+
+    @property
+    def previous_url(self):
+        cursor = self.previous_cursor
+        return self._url('before', cursor) if cursor else None
+
+
+def _field_names(keys):
+    return [key.lstrip('-') for key in keys]
+
+
+def _cursor_value(value):
+    # Full isoformat keeps microseconds so the seek boundary matches the stored value exactly
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_cursor(obj, keys):
+    values = [_cursor_value(getattr(obj, name)) for name in _field_names(keys)]
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys):
+    """Return the key values stored in `cursor`, or None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        names = _field_names(keys)
+        if not isinstance(values, list) or len(values) != len(names):
+            return None
+        return [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(names, values)
+        ]
+    except (ValueError, TypeError, LookupError, ValidationError):
+        return None
+
+
+def _seek_filter(keys, values, forward):
+    """
+    Build the row-value comparison `(k1, k2, ...) > (v1, v2, ...)` as nested Q objects,
+    flipping the operator per key for descending orderings and for backwards seeks.
+    """
+    names = _field_names(keys)
+    condition = None
+    for index in reversed(range(len(names))):
+        descending = keys[index].startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f"{names[index]}__{lookup}": values[index]})
+        if condition is not None:
+            step |= Q(**{names[index]: values[index]}) & condition
+        condition = step
+    return condition
+
+
+def _reverse(keys):
+    return [key[1:] if key.startswith('-') else f"-{key}" for key in keys]
+
+
+def _page_query(request, queryset, keys, per_page):
+    """
+    The rows to fetch for the requested page: (queryset, backwards, has_previous).
+    A backwards page is fetched in reverse order and flipped by _build_page().
+    """
+    model = queryset.model
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+
+    if before:
+        values = decode_cursor(before, model, keys)
+        if values is not None:
+            rows = (
+                queryset.filter(_seek_filter(keys, values, forward=False))
+                .order_by(*_reverse(keys))[:per_page + 1]
+            )
+            return rows, True, None
+
+    has_previous = False
+    if after:
+        values = decode_cursor(after, model, keys)
+        if values is not None:
+            queryset = queryset.filter(_seek_filter(keys, values, forward=True))
+            has_previous = True
+    return queryset.order_by(*keys)[:per_page + 1], False, has_previous
+
+
+def _build_page(request, rows, keys, per_page, backwards, has_previous):
+    if backwards:
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(request, items, keys, has_next=True, has_previous=len(rows) > per_page)
+    return KeysetPage(
+        request, rows[:per_page], keys,
+        has_next=len(rows) > per_page, has_previous=has_previous,
+    )
+
+
+def paginate_keyset(request, queryset, keys, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Seek-paginate `queryset` ordered by `keys` (the last key must be unique, e.g. id).
+    Reads `?after=<cursor>` / `?before=<cursor>` so every page is an indexed range
+    scan of `per_page + 1` rows instead of an OFFSET over everything before it.
+    """
+    rows, backwards, has_previous = _page_query(request, queryset, keys, per_page)
+    return _build_page(request, list(rows), keys, per_page, backwards, has_previous)
+
+
+async def apaginate_keyset(request, queryset, keys, per_page=DEFAULT_PAGE_SIZE):
+    """Async paginate_keyset() for coroutine views."""
+    rows, backwards, has_previous = _page_query(request, queryset, keys, per_page)
+    return _build_page(request, [row async for row in rows], keys, per_page, backwards, has_previous)
+
+
+def wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def keyset_json_response(page, serialize):
+    """JSON variant of a page for infinite-scroll clients."""
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page.items],
+        'next': page.next_url,
+        'previous': page.previous_url,
+    })
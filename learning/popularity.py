@@ -0,0 +1,116 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+
+from .models import Topic, TopicViewCount
+
+logger = logging.getLogger(__name__)
+
+# Topic page views are added up in memory and written by a background thread
+# every VIEW_FLUSH_INTERVAL seconds, one transaction per flush, so a read never
+# waits on SQLite's write lock. Views are keyed by slug (the page may be served
+# from the cache or as a 304 without the topic being loaded); the flush resolves
+# slugs to published topics inside the upsert itself.
+
+# Requests carrying this header aren't counted: the static-site build renders
+# every topic page through the test client, and those renders aren't readers.
+UNCOUNTED_HEADER = 'HTTP_X_LEARNING_UNCOUNTED'
+
+PopularEntry = namedtuple('PopularEntry', ['slug', 'title', 'views'])
+
+_lock = threading.Lock()
+_pending = Counter()
+_flusher_pid = None
+
+_UPSERT = (
+    f'INSERT INTO {TopicViewCount._meta.db_table} (topic_id, subject_id, views) '
+    f'SELECT id, subject_id, %s FROM {Topic._meta.db_table} WHERE slug = %s AND status = %s '
+    f'ON CONFLICT (topic_id) DO UPDATE SET '
+    f'views = {TopicViewCount._meta.db_table}.views + excluded.views, subject_id = excluded.subject_id'
+)
+
+
+# --- COUNTING ---
+
+def record_view(topic_slug):
+    """Count one view of a topic page. Only touches memory; a no-op with VIEW_FLUSH_INTERVAL = 0."""
+    if not settings.VIEW_FLUSH_INTERVAL:
+        return
+    with _lock:
+        _pending[topic_slug] += 1
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def _start_flusher():
+    global _flusher_pid, _pending
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        if _flusher_pid is not None:
+            # A forked worker: the parent's thread didn't come along, and its counts are the parent's to write
+            _pending = Counter()
+        else:
+            atexit.register(flush_views)
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_forever, name='view-counts', daemon=True).start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.VIEW_FLUSH_INTERVAL)
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Flushing view counts failed")
+        finally:
+            close_old_connections()
+
+
+def flush_views():
+    """Add the buffered views to TopicViewCount in one transaction. Returns the number of topics written."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, Counter()
+    if not pending:
+        return 0
+    using = router.db_for_write(TopicViewCount)
+    try:
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.executemany(_UPSERT, [(views, slug, 'published') for slug, views in pending.items()])
+    except DatabaseError:
+        # E.g. the write lock was held past busy_timeout: keep the views for the next flush
+        with _lock:
+            _pending.update(pending)
+        logger.warning("Could not flush view counts for %d topic(s); retrying later", len(pending))
+        return 0
+    return len(pending)
+
+
+# --- POPULAR TOPICS ---
+
+def popularity_epoch():
+    """Changes every POPULAR_TOPICS_REFRESH seconds: popular lists are at most that old."""
+    return int(time.time() // settings.POPULAR_TOPICS_REFRESH)
+
+
+def popular_topics(subject):
+    """The most viewed published topics of a subject."""
+    key = f'learning:popular:{subject.pk}:{popularity_epoch()}'
+    popular = cache.get(key)
+    if popular is None:
+        rows = (
+            TopicViewCount.objects.filter(subject_id=subject.pk, topic__status='published')
+            .order_by('-views')
+            .values_list('topic__slug', 'topic__title', 'views')[:settings.POPULAR_TOPICS_COUNT]
+        )
+        popular = [PopularEntry(*row) for row in rows]
+        cache.set(key, popular, settings.POPULAR_TOPICS_REFRESH)
+    return popular
@@ -0,0 +1,456 @@
+import glob
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from html import unescape
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RelatedTopic, Topic
+from .page_cache import invalidate_pages, subject_pages, SITE
+
+# Published topics are compared as TF-IDF vectors (sublinear tf, smoothed idf,
+# unit length). Past RELATED_DIMENSIONS terms the sparse vectors go through a
+# seeded sparse random projection (each term adds its weight, with a random sign,
+# to a few of the dims), which keeps cosines within a few hundredths. Either way
+# all-pairs similarity is a dense float32 matrix product, computed a block of
+# rows at a time so memory stays flat however many topics there are.
+#
+# The full build also saves the vocabulary, idf and vectors (RELATED_INDEX_PATH),
+# so publishing one topic scores it against that index instead of rebuilding.
+# The saved index is never rewritten in between: each update appends a small
+# file of its own, and the vectors are memory-mapped rather than read.
+
+MIN_DF = 2         # A term in a single topic links it to nothing...
+MAX_DF = 0.5       # ...and one in most topics links it to everything
+MAX_FEATURES = 50_000
+TITLE_WEIGHT = 3   # Title words count as if they appeared this many times
+PROJECTION_SEED = 0
+PROJECTION_HASHES = 4
+BLOCK_BYTES = 128 * 1024 * 1024  # Score matrix per block of rows
+PROJECT_ROWS = 8192              # Topics projected at a time
+WRITE_BATCH = 5000
+MAX_UPDATE_FILES = 200           # Update files replayed before they are merged into one
+
+_TAG_RE = re.compile(r'<[^>]*>')
+_TERM_RE = re.compile(r'[a-z][a-z0-9_]{1,29}')
+
+STOP_WORDS = frozenset("""
+    about above after again against all also am an and any are as at be because been
+    before being below between both but by can could did do does doing down during each
+    few for from further had has have having he her here hers him his how if in into is
+    it its itself just me more most my no nor not now of off on once only or other our
+    ours out over own same she should so some such than that the their theirs them then
+    there these they this those through to too under until up us very was we were what
+    when where which while who whom why will with would you your yours
+""".split())
+
+
+# --- VECTORS ---
+
+def _terms(title, html):
+    text = ' '.join([title] * TITLE_WEIGHT + [unescape(_TAG_RE.sub(' ', html or ''))]).lower()
+    return [term for term in _TERM_RE.findall(text) if term not in STOP_WORDS]
+
+
+def _count(terms, vocabulary, grow):
+    """Distinct term ids of one topic and their counts. Unknown terms are added when `grow`, else skipped."""
+    if grow:
+        ids = [vocabulary.setdefault(term, len(vocabulary)) for term in terms]
+    else:
+        ids = [vocabulary[term] for term in terms if term in vocabulary]
+    return np.unique(np.array(ids, dtype=np.int64), return_counts=True)
+
+
+def _projection(n_terms, dims):
+    """For each term, the dims it adds its weight to and the sign it adds it with."""
+    rng = np.random.default_rng(PROJECTION_SEED)
+    slots = rng.integers(0, dims, size=(n_terms, PROJECTION_HASHES))
+    signs = rng.choice(np.array([-1, 1], dtype=np.float32), size=(n_terms, PROJECTION_HASHES))
+    return slots, signs
+
+
+def _vectorize(counted, idf, dims, remap=None):
+    """Unit vectors for counted topics: TF-IDF itself if dims == len(idf), else its projection."""
+    n_rows = len(counted)
+    vectors = np.zeros((n_rows, dims), dtype=np.float32)
+    if not n_rows:
+        return vectors
+    # The sparse matrix in coordinate form, rows in order
+    rows = np.repeat(np.arange(n_rows), [len(ids) for ids, _ in counted])
+    cols = np.concatenate([ids for ids, _ in counted])
+    tf = np.concatenate([counts for _, counts in counted])
+    if remap is not None:
+        cols = remap[cols]
+        kept = cols >= 0
+        rows, cols, tf = rows[kept], cols[kept], tf[kept]
+    weights = ((1 + np.log(tf)) * idf[cols]).astype(np.float32)
+
+    if dims == len(idf):
+        vectors[rows, cols] = weights
+    else:
+        slots, signs = _projection(len(idf), dims)
+        for start in range(0, n_rows, PROJECT_ROWS):
+            end = min(start + PROJECT_ROWS, n_rows)
+            lo, hi = np.searchsorted(rows, [start, end])
+            chunk_cols = cols[lo:hi]
+            cells = ((rows[lo:hi, None] - start) * dims + slots[chunk_cols]).ravel()
+            contributions = (signs[chunk_cols] * weights[lo:hi, None]).ravel()
+            vectors[start:end] = np.bincount(
+                cells, weights=contributions, minlength=(end - start) * dims,
+            ).reshape(end - start, dims)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _best(scores, k):
+    """Columns of the `k` highest scores in each row, and those scores, best first."""
+    best = np.argpartition(scores, -k, axis=1)[:, -k:]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _top_k(queries, vectors, k, self_offset=None):
+    """
+    Yield (query row, neighbour rows, scores), best first, for every query,
+    scoring a block of queries against all vectors at a time. With `self_offset`,
+    query i is vectors[self_offset + i] and never its own neighbour.
+    """
+    k = min(k, len(vectors) - (self_offset is not None))
+    if k <= 0:
+        return
+    block = max(1, BLOCK_BYTES // (4 * len(vectors)))
+    for start in range(0, len(queries), block):
+        scores = queries[start:start + block] @ vectors.T
+        local = np.arange(len(scores))
+        if self_offset is not None:
+            scores[local, self_offset + start + local] = -np.inf
+        best, best_scores = _best(scores, k)
+        for i in local:
+            yield start + i, best[i], best_scores[i]
+
+
+def _links(ids, neighbours, scores):
+    min_score = settings.RELATED_MIN_SCORE
+    return [(int(ids[j]), float(score)) for j, score in zip(neighbours, scores) if score >= min_score]
+
+
+def _floor(links, k):
+    """The score a newcomer has to beat to enter a topic's links."""
+    return links[-1][1] if len(links) >= k else settings.RELATED_MIN_SCORE
+
+
+def _published(topic_ids=None):
+    topics = Topic.objects.filter(status='published')
+    if topic_ids is not None:
+        topics = topics.filter(pk__in=topic_ids)
+    return topics.order_by('pk').values_list('pk', 'title', 'content').iterator(chunk_size=2000)
+
+
+# --- STORAGE ---
+# RELATED_INDEX_PATH (.npz) holds the ids, floors, vocabulary and idf of the last
+# build, and names the .npy beside it that holds the vectors. Updates go to the
+# `.updates` directory next to it, one file each, named so they sort in the order
+# they were written; loading replays them on top of the build they belong to.
+
+def _sibling(path, suffix):
+    stem, _ = os.path.splitext(str(path))
+    return stem + suffix
+
+
+def _updates_dir(path):
+    return _sibling(path, '.updates')
+
+
+def _write_atomic(path, write):
+    # Written to a temporary file and renamed, so a reader never sees half a file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            write(handle)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Gone already, or still mapped by a reader (Windows); the next build retries
+
+
+def _save_build(path, ids, vectors, floors, terms, idf):
+    token = f'{time.time_ns():x}'
+    vectors_path = _sibling(path, f'.{token}.npy')
+    _write_atomic(vectors_path, lambda handle: np.save(handle, vectors))
+    _write_atomic(path, lambda handle: np.savez(
+        handle, token=np.array(token), ids=ids, floors=floors, terms=terms, idf=idf,
+    ))
+    # Earlier builds' vectors and updates are superseded
+    _remove(name for name in glob.glob(glob.escape(_sibling(path, '.')) + '*.npy') if name != vectors_path)
+    _remove(
+        name for name in glob.glob(os.path.join(glob.escape(_updates_dir(path)), '*.npz'))
+        if not os.path.basename(name).startswith(token + '-')
+    )
+
+
+def _update_name(path, token):
+    return os.path.join(_updates_dir(path), f'{token}-{time.time_ns():020d}-{os.getpid()}.npz')
+
+
+def _save_update(name, removed, ids, vectors, floor_ids, floors):
+    _write_atomic(name, lambda handle: np.savez(
+        handle, removed=np.asarray(removed, dtype=np.int64), ids=ids, vectors=vectors,
+        floor_ids=np.asarray(floor_ids, dtype=np.int64), floors=np.asarray(floors, dtype=np.float32),
+    ))
+
+
+class _Index:
+    """
+    The last build plus every update since. Rows are the build's topics followed
+    by topics added since; a topic that changed keeps its old row, marked dead.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.token = str(data['token'])
+            self.terms, self.idf = data['terms'], data['idf']
+            self.ids, self.floors = data['ids'], data['floors'].astype(np.float32)
+        self.base = np.load(_sibling(path, f'.{self.token}.npy'), mmap_mode='r')
+        self.base_floors = self.floors.copy()
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.vectors = np.zeros((0, self.base.shape[1]), dtype=np.float32)
+        self.files = sorted(glob.glob(os.path.join(glob.escape(_updates_dir(path)), glob.escape(self.token) + '-*.npz')))
+        added = []
+        for name in self.files:
+            with np.load(name, allow_pickle=False) as update:
+                self.forget(update['removed'])
+                self.add(update['ids'], None)
+                added.append(update['vectors'])
+                self.set_floors(update['floor_ids'], update['floors'])
+        if added:
+            self.vectors = np.vstack(added)
+
+    def rows(self, topic_ids):
+        return np.flatnonzero(self.alive & np.isin(self.ids, topic_ids))
+
+    def forget(self, topic_ids):
+        self.alive[self.rows(topic_ids)] = False
+
+    def add(self, topic_ids, vectors):
+        """Append rows for these topics (their vectors too, unless the caller stacks them); returns the first."""
+        self.forget(topic_ids)
+        first = len(self.ids)
+        self.ids = np.concatenate([self.ids, topic_ids])
+        self.alive = np.concatenate([self.alive, np.ones(len(topic_ids), dtype=bool)])
+        self.floors = np.concatenate([self.floors, np.full(len(topic_ids), settings.RELATED_MIN_SCORE, dtype=np.float32)])
+        if vectors is not None:
+            self.vectors = np.vstack([self.vectors, vectors])
+        return first
+
+    def set_floors(self, topic_ids, floors):
+        order = np.argsort(topic_ids)
+        rows = self.rows(topic_ids)
+        positions = order[np.searchsorted(topic_ids, self.ids[rows], sorter=order)]
+        self.floors[rows] = floors[positions]
+
+    def scores(self, queries):
+        """Yield (first query, scores against every row) a block of queries at a time; dead rows score -inf."""
+        block = max(1, BLOCK_BYTES // (4 * len(self.ids)))
+        for start in range(0, len(queries), block):
+            part = queries[start:start + block]
+            scores = np.hstack([part @ self.base.T, part @ self.vectors.T])
+            scores[:, ~self.alive] = -np.inf
+            yield start, scores
+
+    def compact(self):
+        """Merge the replayed update files into one that stands in for all of them."""
+        if len(self.files) <= MAX_UPDATE_FILES:
+            return
+        base_rows = len(self.base)
+        dead = self.ids[:base_rows][~self.alive[:base_rows]]
+        added = np.flatnonzero(self.alive[base_rows:])
+        changed = self.alive & np.concatenate([
+            self.floors[:base_rows] != self.base_floors, np.ones(len(self.ids) - base_rows, dtype=bool),
+        ])
+        # Sorts right after the last file it replaces, before anything written since
+        merged = self.files[-1][:-len('.npz')] + '~merged.npz'
+        _save_update(
+            merged, dead, self.ids[base_rows:][added], self.vectors[added],
+            self.ids[changed], self.floors[changed],
+        )
+        _remove(name for name in self.files if name != merged)
+
+
+def _write_links(links):
+    """Insert {topic_id: [(related_id, score)]} as RelatedTopic rows, ranks from 1."""
+    batch = []
+    for topic_id, related in links.items():
+        for rank, (related_id, score) in enumerate(related, 1):
+            batch.append(RelatedTopic(topic_id=topic_id, related_id=related_id, rank=rank, score=score))
+            if len(batch) >= WRITE_BATCH:
+                RelatedTopic.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        RelatedTopic.objects.bulk_create(batch)
+
+
+def _refresh_pages(topic_ids):
+    slugs = set(Topic.objects.filter(pk__in=topic_ids).values_list('subject__slug', flat=True))
+    transaction.on_commit(lambda: invalidate_pages(*(subject_pages(slug) for slug in slugs)))
+
+
+# --- BUILD & UPDATE ---
+
+def build_related(k=None):
+    """
+    Recompute the related topics of every published topic and save the index
+    incremental updates start from. Returns (topics, terms, links written).
+    """
+    k = k or settings.RELATED_TOPICS_COUNT
+    started = timezone.now()
+    vocabulary, ids, counted = {}, [], []
+    for pk, title, content in _published():
+        ids.append(pk)
+        counted.append(_count(_terms(title, content), vocabulary, grow=True))
+    ids = np.array(ids, dtype=np.int64)
+
+    df = np.bincount(np.concatenate([terms for terms, _ in counted]), minlength=len(vocabulary)) \
+        if counted else np.zeros(len(vocabulary), dtype=np.int64)
+    keep = np.flatnonzero((df >= MIN_DF) & (df <= max(MIN_DF, MAX_DF * len(ids))))
+    if len(keep) > MAX_FEATURES:
+        keep = np.sort(keep[np.argsort(-df[keep], kind='stable')[:MAX_FEATURES]])
+    remap = np.full(len(vocabulary), -1, dtype=np.int64)
+    remap[keep] = np.arange(len(keep))
+    words = list(vocabulary)
+    terms = np.array([words[i] for i in keep], dtype=str)
+    del vocabulary, words
+    idf = (np.log((1 + len(ids)) / (1 + df[keep])) + 1).astype(np.float32)
+
+    vectors = _vectorize(counted, idf, min(len(keep), settings.RELATED_DIMENSIONS), remap)
+    del counted
+    floors = np.full(len(ids), settings.RELATED_MIN_SCORE, dtype=np.float32)
+    links = {}
+    for row, neighbours, scores in _top_k(vectors, vectors, k, self_offset=0):
+        links[int(ids[row])] = _links(ids, neighbours, scores)
+        floors[row] = _floor(links[int(ids[row])], k)
+
+    _save_build(settings.RELATED_INDEX_PATH, ids, vectors, floors, terms, idf)
+    # The write lock is only taken once everything is computed and saved
+    with transaction.atomic():
+        RelatedTopic.objects.all().delete()
+        _write_links(links)
+        transaction.on_commit(lambda: invalidate_pages(SITE))
+
+    # Topics published or withdrawn while this ran were updated against the old index
+    update_related(Topic.objects.filter(updated_at__gte=started).values_list('pk', flat=True), k)
+    return len(ids), len(terms), sum(len(related) for related in links.values())
+
+
+def update_related(topic_ids, k=None):
+    """
+    Fit these topics into the saved index: published ones get fresh links and may
+    enter the links of existing topics, the rest are dropped. Vocabulary and idf
+    stay as of the last full build. Returns the number of topics whose links
+    changed, or None before the first build.
+
+    The index is read and scored before the write transaction, which only swaps
+    the affected links; the update file is written once that commits.
+    """
+    path = settings.RELATED_INDEX_PATH
+    if not path or not os.path.exists(path):
+        return None
+    topic_ids = list(set(topic_ids))
+    if not topic_ids:
+        return 0
+    k = k or settings.RELATED_TOPICS_COUNT
+    min_score = settings.RELATED_MIN_SCORE
+
+    try:
+        index = _Index(path)
+    except KeyError:
+        return None  # Saved before update files existed; the next build replaces it
+    index.compact()
+    rows = list(_published(topic_ids))
+    index.forget(topic_ids)
+    # Topics linking to these lose a link, so any newcomer above the minimum may take its place
+    orphaned = set(
+        RelatedTopic.objects.filter(related_id__in=topic_ids)
+        .exclude(topic_id__in=topic_ids).values_list('topic_id', flat=True)
+    )
+    index.floors[index.rows(list(orphaned))] = min_score
+
+    vocabulary = {term: i for i, term in enumerate(index.terms.tolist())}
+    added_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    added = _vectorize(
+        [_count(_terms(title, content), vocabulary, grow=False) for _, title, content in rows],
+        index.idf, index.base.shape[1],
+    )
+    links, newcomers = {}, defaultdict(list)
+    if rows:
+        first = index.add(added_ids, added)
+        k_added = min(k, int(index.alive.sum()) - 1)
+        for start, scores in index.scores(added):
+            local = np.arange(len(scores))
+            scores[local, first + start + local] = -np.inf
+            if k_added > 0:
+                best, best_scores = _best(scores, k_added)
+                for i in local:
+                    links[int(added_ids[start + i])] = _links(index.ids, best[i], best_scores[i])
+            # Existing topics for which a newcomer beats their weakest link
+            for i, row in zip(*np.nonzero(scores[:, :first] > index.floors[:first])):
+                newcomers[int(index.ids[row])].append((int(added_ids[start + i]), float(scores[i, row])))
+
+    with transaction.atomic():
+        orphaned |= set(
+            RelatedTopic.objects.filter(related_id__in=topic_ids)
+            .exclude(topic_id__in=topic_ids).values_list('topic_id', flat=True)
+        )
+        RelatedTopic.objects.filter(Q(topic_id__in=topic_ids) | Q(related_id__in=topic_ids)).delete()
+        if newcomers:
+            current = defaultdict(list)
+            for topic_id, related_id, score in (
+                RelatedTopic.objects.filter(topic_id__in=list(newcomers))
+                .order_by('rank').values_list('topic_id', 'related_id', 'score')
+            ):
+                current[topic_id].append((related_id, score))
+            for topic_id, entering in newcomers.items():
+                links[topic_id] = sorted(current[topic_id] + entering, key=lambda link: -link[1])[:k]
+            RelatedTopic.objects.filter(topic_id__in=list(newcomers)).delete()
+
+        # Topics deleted or withdrawn since they were indexed, whose own job hasn't run yet
+        linked = set(links) | {related_id for related in links.values() for related_id, _ in related}
+        gone = linked - set(Topic.objects.filter(pk__in=linked, status='published').values_list('pk', flat=True))
+        if gone:
+            links = {
+                topic_id: [link for link in related if link[0] not in gone]
+                for topic_id, related in links.items() if topic_id not in gone
+            }
+        _write_links(links)
+
+        changed = set(topic_ids) | orphaned | set(links)
+        _refresh_pages(changed)
+
+        kept = ~np.isin(added_ids, list(gone))
+        floors = {topic_id: min_score for topic_id in orphaned}
+        floors.update((topic_id, _floor(related, k)) for topic_id, related in links.items())
+        name = _update_name(path, index.token)
+        transaction.on_commit(lambda: _save_update(
+            name, [*topic_ids, *gone], added_ids[kept], added[kept],
+            list(floors), list(floors.values()),
+        ))
+    return len(changed)
@@ -0,0 +1,247 @@
+import re
+from functools import lru_cache
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from .images import variants_for_url
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:  # Optional: without Pygments, prism.js highlights in the browser
+    highlight = None
+
+# Bump whenever the output of render_content() changes so that
+# `manage.py render_topics` knows which stored HTML is stale.
+RENDER_PIPELINE_VERSION = 2
+
+# --- SANITIZER RULES (everything CKEditor 5 can emit with our toolbar) ---
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'strong', 'b', 'em', 'i', 'u', 's', 'sub', 'sup', 'mark', 'span', 'div',
+    'a', 'ul', 'ol', 'li', 'blockquote', 'pre', 'code',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption', 'colgroup', 'col',
+    'figure', 'figcaption', 'img', 'picture', 'source', 'oembed',
+}
+VOID_TAGS = {'br', 'hr', 'img', 'col', 'source'}
+# Content inside these is dropped along with the tag itself
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+
+GLOBAL_ATTRS = {'class', 'title'}
+TAG_ATTRS = {
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height', 'srcset', 'sizes', 'loading', 'decoding'},
+    'source': {'srcset', 'type', 'sizes'},
+    'oembed': {'url'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start', 'reversed'},
+    'figure': {'style'},
+}
+URL_ATTRS = {'href', 'src', 'url'}
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# CKEditor language ids that Pygments knows under another name
+LEXER_ALIASES = {'plaintext': 'text'}
+# CKEditor's image resize writes `style="width:NN%"` on the figure; nothing else survives
+SAFE_STYLE_RE = re.compile(r'^\s*width\s*:\s*\d+(\.\d+)?(%|px)\s*;?\s*$')
+# Rendered width of article images: full viewport on the stacked mobile layout,
+# otherwise the content column next to the sidebar
+IMAGE_SIZES = '(max-width: 850px) 100vw, 1100px'
+
+
+def code_block_languages():
+    """Languages offered by the CKEditor code block plugin."""
+    config = settings.CKEDITOR_5_CONFIGS.get('default', {}).get('codeBlock', {})
+    return {entry['language'] for entry in config.get('languages', [])}
+
+
+def _safe_url(value):
+    scheme = urlsplit(value.strip()).scheme.lower()
+    return scheme in SAFE_URL_SCHEMES
+
+
+def _clean_attrs(tag, attrs):
+    allowed = GLOBAL_ATTRS | TAG_ATTRS.get(tag, set())
+    cleaned = []
+    for name, value in attrs:
+        name = name.lower()
+        if name not in allowed or value is None:
+            continue
+        if name in URL_ATTRS and not _safe_url(value):
+            continue
+        if name == 'style' and not SAFE_STYLE_RE.match(value):
+            continue
+        cleaned.append((name, value))
+    if tag == 'a' and any(name == 'target' for name, _ in cleaned):
+        cleaned = [(n, v) for n, v in cleaned if n != 'rel'] + [('rel', 'noopener noreferrer')]
+    return cleaned
+
+
+def _format_attrs(attrs):
+    return ''.join(f' {name}="{escape(value, quote=True)}"' for name, value in attrs)
+
+
+# Placeholder on the open-tag stack for a <pre> already written by _flush_code_block()
+_HIGHLIGHTED_PRE = '#highlighted-pre'
+
+
+class _ContentRenderer(HTMLParser):
+    """Single pass over CKEditor HTML: allowlist sanitising plus code block highlighting."""
+
+    def __init__(self, languages):
+        super().__init__(convert_charrefs=True)
+        self.languages = languages
+        self.out = []
+        self.open_tags = []
+        self.drop_depth = 0
+        # Set while inside <pre><code class="language-x">: [language, collected text]
+        self.code_block = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_depth += 1
+            return
+        if self.drop_depth or tag not in ALLOWED_TAGS:
+            return
+        if self.code_block is not None:
+            return
+        if tag == 'code' and self.open_tags and self.open_tags[-1] == 'pre' and self.out[-1].startswith('<pre'):
+            language = self._language(attrs)
+            if language is not None:
+                # The <pre> has already been written; rewrite it once we know the language
+                self.out.pop()
+                self.open_tags.pop()
+                self.code_block = [language, []]
+                return
+        attrs = _clean_attrs(tag, attrs)
+        if tag == 'img':
+            self.out.append(self._image(attrs))
+            return
+        self.out.append(f'<{tag}{_format_attrs(attrs)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_depth = max(self.drop_depth - 1, 0)
+            return
+        if self.drop_depth:
+            return
+        if self.code_block is not None:
+            if tag == 'code':
+                self._flush_code_block()
+            return
+        if tag == 'pre' and self.open_tags and self.open_tags[-1] == _HIGHLIGHTED_PRE:
+            self.open_tags.pop()
+            return
+        if tag not in self.open_tags:
+            return
+        # Close anything left open inside this element so the output stays balanced
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            if open_tag != _HIGHLIGHTED_PRE:
+                self.out.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.drop_depth:
+            return
+        if self.code_block is not None:
+            self.code_block[1].append(data)
+        else:
+            self.out.append(escape(data, quote=False))
+
+    def _image(self, attrs):
+        """Lazy-load every image; uploads with WebP variants get a <picture> + srcset."""
+        present = {name for name, _ in attrs}
+        extra = [('loading', 'lazy'), ('decoding', 'async')]
+        src = dict(attrs).get('src')
+        variants = variants_for_url(src) if 'srcset' not in present else None
+        if variants:
+            extra += [('width', str(variants['width'])), ('height', str(variants['height']))]
+        img = f'<img{_format_attrs(attrs + [(n, v) for n, v in extra if n not in present])}>'
+        if not variants or 'picture' in self.open_tags:
+            return img
+        srcset = ', '.join(f'{url} {width}w' for url, width in variants['webp'])
+        source = _format_attrs([('type', 'image/webp'), ('srcset', srcset), ('sizes', IMAGE_SIZES)])
+        return f'<picture><source{source}>{img}</picture>'
+
+    def _language(self, attrs):
+        for name, value in attrs:
+            if name == 'class' and value:
+                for css_class in value.split():
+                    if css_class.startswith('language-'):
+                        return css_class[len('language-'):]
+        return None
+
+    def _flush_code_block(self):
+        language, chunks = self.code_block
+        self.code_block = None
+        code = ''.join(chunks)
+        highlighted = _highlight(code, language) if language in self.languages else None
+        if highlighted is None:
+            # Leave it to prism.js on the client
+            self.out.append(
+                f'<pre><code class="language-{escape(language, quote=True)}">'
+                f'{escape(code, quote=False)}</code></pre>'
+            )
+        else:
+            # No `language-*` class, so prism.js skips blocks that are already highlighted
+            self.out.append(
+                f'<pre class="highlight" data-language="{escape(language, quote=True)}">'
+                f'<code>{highlighted}</code></pre>'
+            )
+        # Swallow the matching </pre>
+        self.open_tags.append(_HIGHLIGHTED_PRE)
+
+    def render(self, html):
+        self.feed(html or '')
+        self.close()
+        if self.code_block is not None:
+            self._flush_code_block()
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            if open_tag != _HIGHLIGHTED_PRE:
+                self.out.append(f'</{open_tag}>')
+        return ''.join(self.out)
+
+
+# Building a formatter (it compiles a stylesheet) or a lexer costs far more than
+# highlighting a typical snippet; both are stateless between calls, so reuse them.
+@lru_cache(maxsize=None)
+def _formatter():
+    return HtmlFormatter(nowrap=True)
+
+
+@lru_cache(maxsize=64)
+def _lexer(language):
+    try:
+        return get_lexer_by_name(LEXER_ALIASES.get(language, language))
+    except ClassNotFound:
+        return None
+
+
+def _highlight(code, language):
+    if highlight is None:
+        return None
+    lexer = _lexer(language)
+    if lexer is None:
+        return None
+    return highlight(code, lexer, _formatter()).rstrip('\n')
+
+
+def render_content(html):
+    """Sanitised, syntax-highlighted HTML for a topic body."""
+    return _ContentRenderer(code_block_languages()).render(html)
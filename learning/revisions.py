@@ -0,0 +1,214 @@
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils.safestring import mark_safe
+
+from .models import TopicRevision
+from .rendering import render_content
+
+# Every Nth revision stores the full content, so rebuilding any revision replays
+# at most N - 1 deltas.
+SNAPSHOT_INTERVAL = 10
+COMPRESS_LEVEL = 6
+
+# CKEditor writes its blocks back to back without newlines; cut after each block
+# close so deltas and diffs work on whole paragraphs, headings, code blocks...
+_BLOCK_END_RE = re.compile(
+    r'</(?:p|h[1-6]|pre|blockquote|ul|ol|table|figure|div)>|<hr\s*/?>', re.IGNORECASE,
+)
+
+
+def split_blocks(html):
+    """Split HTML into consecutive chunks that join back to exactly `html`."""
+    html = html or ''
+    blocks, start = [], 0
+    for match in _BLOCK_END_RE.finditer(html):
+        blocks.append(html[start:match.end()])
+        start = match.end()
+    if start < len(html):
+        blocks.append(html[start:])
+    return blocks
+
+
+# --- ENCODING ---
+# A delta is a JSON list of ops: [i, j] copies blocks i..j-1 of the previous
+# revision, a string is new content.
+
+def _compress(text):
+    return zlib.compress(text.encode(), COMPRESS_LEVEL)
+
+
+def _delta(base_blocks, blocks):
+    ops = []
+    matcher = SequenceMatcher(None, base_blocks, blocks, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(blocks[j1:j2]))
+    return _compress(json.dumps(ops, separators=(',', ':')))
+
+
+def _apply(revision, base_content):
+    raw = zlib.decompress(bytes(revision.data)).decode()
+    if revision.is_snapshot:
+        return raw
+    base_blocks = split_blocks(base_content)
+    return ''.join(
+        ''.join(base_blocks[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(raw)
+    )
+
+
+def _chain(topic_id, number=None):
+    """The revisions from the last snapshot up to `number` (default: the newest), oldest first."""
+    revisions = TopicRevision.objects.filter(topic_id=topic_id)
+    if number is not None:
+        revisions = revisions.filter(number__lte=number)
+    snapshot = revisions.filter(is_snapshot=True).order_by('-number').values('number')[:1]
+    return list(revisions.filter(number__gte=Subquery(snapshot)).order_by('number'))
+
+
+def _replay(chain):
+    content = None
+    for revision in chain:
+        content = _apply(revision, content)
+    return content
+
+
+def revision_content(topic_id, number):
+    """Rebuild the content of one revision, or None if it doesn't exist."""
+    chain = _chain(topic_id, number)
+    if not chain or chain[-1].number != number:
+        return None
+    return _replay(chain)
+
+
+# --- RECORDING ---
+
+def record_revision(topic):
+    """Append a revision for the topic's title and content unless neither changed."""
+    # On SQLite the transaction holds the write lock from the start, so two saves
+    # of the same topic can't both pick the next number
+    with transaction.atomic():
+        chain = _chain(topic.pk)
+        head = chain[-1] if chain else None
+        head_content = _replay(chain)
+        if head is not None and head.title == topic.title and head_content == topic.content:
+            return None
+
+        number = head.number + 1 if head else 1
+        content = topic.content or ''
+        data = _compress(content)
+        is_snapshot = head is None or number % SNAPSHOT_INTERVAL == 1
+        if not is_snapshot:
+            delta = _delta(split_blocks(head_content), split_blocks(content))
+            # A rewrite can make the delta bigger than the whole article
+            if len(delta) < len(data):
+                data = delta
+            else:
+                is_snapshot = True
+        return TopicRevision.objects.create(
+            topic=topic, number=number, title=topic.title, is_snapshot=is_snapshot,
+            data=data, size=len(content), reviewed=topic.status == 'published',
+        )
+
+
+def prune_topic(topic_id, keep):
+    """
+    Drop all but the newest `keep` revisions of a topic, plus the last reviewed
+    one that the next review diffs against. Survivors whose base is about to go
+    are rewritten as snapshots first, so each can still be rebuilt. Returns the
+    number deleted.
+    """
+    with transaction.atomic():
+        history = list(
+            TopicRevision.objects.filter(topic_id=topic_id)
+            .order_by('-number').values_list('number', 'reviewed')
+        )
+        if len(history) <= keep:
+            return 0
+        cutoff = history[keep - 1][0]
+        reviewed = next((number for number, was_reviewed in history if was_reviewed), None)
+        survivors = [cutoff] + ([reviewed] if reviewed is not None and reviewed < cutoff else [])
+
+        for number in survivors:
+            chain = _chain(topic_id, number)
+            if not chain[-1].is_snapshot:
+                TopicRevision.objects.filter(pk=chain[-1].pk).update(
+                    is_snapshot=True, data=_compress(_replay(chain)),
+                )
+        deleted, _ = (
+            TopicRevision.objects.filter(topic_id=topic_id, number__lt=cutoff)
+            .exclude(number__in=survivors).delete()
+        )
+        return deleted
+
+
+def mark_reviewed(topic_ids):
+    """Flag the newest revision of each topic as the state a moderator decided on."""
+    newest = TopicRevision.objects.filter(topic_id=OuterRef('topic_id')).order_by('-number').values('number')[:1]
+    TopicRevision.objects.filter(topic_id__in=topic_ids, number=Subquery(newest)).update(reviewed=True)
+
+
+# --- DIFF FOR REVIEW ---
+
+class RevisionDiff:
+    """Changed blocks between a base revision and the topic as it is now."""
+
+    def __init__(self, base, hunks):
+        self.base = base
+        self.hunks = hunks
+
+    @property
+    def has_changes(self):
+        return any(hunk['kind'] == 'change' for hunk in self.hunks)
+
+
+def _render_blocks(blocks):
+    return mark_safe(render_content(''.join(blocks))) if blocks else ''
+
+
+def review_diff(topic):
+    """
+    Diff the topic against the last revision a moderator reviewed (or the
+    previous revision if none was), or None for a topic with no history.
+    Unchanged runs are collapsed to a count, so only edited blocks are rendered.
+    """
+    history = list(
+        TopicRevision.objects.filter(topic_id=topic.pk)
+        .order_by('-number').values_list('number', 'reviewed')
+    )
+    reviewed = [number for number, was_reviewed in history if was_reviewed]
+    if reviewed:
+        base_number = reviewed[0]
+    elif len(history) > 1:
+        base_number = history[1][0]
+    else:
+        return None
+    head_number = history[0][0]
+    chain = _chain(topic.pk, base_number)
+    if not chain or chain[-1].number != base_number:
+        return None
+    base = chain[-1]
+
+    old_blocks = split_blocks(_replay(chain))
+    new_blocks = split_blocks(topic.content)
+    hunks = []
+    matcher = SequenceMatcher(None, old_blocks, new_blocks, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            hunks.append({'kind': 'same', 'count': i2 - i1})
+        else:
+            hunks.append({
+                'kind': 'change',
+                'removed': _render_blocks(old_blocks[i1:i2]),
+                'added': _render_blocks(new_blocks[j1:j2]),
+            })
+    base.title_changed = base.title != topic.title
+    base.revisions_since = head_number - base_number
+    return RevisionDiff(base, hunks)
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_version, bump_version
+from .models import Profile
+
+DEFAULT_ROLE = 'reader'
+
+
+def role_version_name(user_id):
+    return f'role:{user_id}'
+
+
+def invalidate_role(user_id):
+    bump_version(role_version_name(user_id))
+
+
+def _load_role(user_id):
+    return Profile.objects.filter(user_id=user_id).values_list('role', flat=True).first() or DEFAULT_ROLE
+
+
+def resolve_role(request):
+    """
+    The signed-in user's Profile.role, or None for anonymous visitors.
+
+    With a shared cache the role is cached there under the user's role version,
+    so a profile change is seen at once and any other change after
+    ROLE_CACHE_SECONDS; the session is never written. A per-process cache would
+    only tell the worker that saved the profile, leaving a demoted moderator
+    their old role everywhere else, so without one it's read on every request.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if not settings.SHARED_CACHE:
+        return _load_role(user.pk)
+
+    key = f'learning:role:{user.pk}:{get_version(role_version_name(user.pk))}'
+    role = cache.get(key)
+    if role is None:
+        role = _load_role(user.pk)
+        cache.set(key, role, settings.ROLE_CACHE_SECONDS)
+    return role
+
+
+def get_role(request):
+    """request.role when RoleMiddleware is installed, otherwise resolved on the spot."""
+    if not hasattr(request, 'role'):
+        request.role = resolve_role(request)
+    return request.role
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+# Set on every response to a write; while it is present the browser reads from the
+# primary, so people see their own changes before the replica catches up.
+PIN_COOKIE = 'primary_pin'
+
+# Public content only. Users, profiles and sessions always come from the primary:
+# a stale role or login would be cached far longer than the replica lags.
+REPLICATED_MODELS = {'subject', 'category', 'topic', 'reference', 'project'}
+
+_reading_from_replica = ContextVar('learning_reading_from_replica', default=False)
+
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def reading_from_replica():
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    """Send content reads inside `reading_from_replica()` to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _reading_from_replica.get()
+            and model._meta.app_label == 'learning'
+            and model._meta.model_name in REPLICATED_MODELS
+        ):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so rows from either can be related
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema from the primary on every refresh
+        return db == DEFAULT_DB_ALIAS
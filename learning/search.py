@@ -0,0 +1,178 @@
+import re
+from html import unescape
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from .models import Topic
+
+# SQLite FTS5 table holding title + tag-stripped content of published topics.
+# The rowid of every entry is the Topic primary key.
+FTS_TABLE = 'learning_topic_fts'
+
+# FTS5 wraps matches in these sentinels; they only become <mark> tags after
+# the snippet has been escaped, so article text can never inject markup.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+MAX_QUERY_TERMS = 8
+TITLE_WEIGHT = 10.0
+SNIPPET_TOKENS = 24
+
+_TOKEN_RE = re.compile(r'\w+')
+_available = {}
+
+
+def _read_connection():
+    return connections[router.db_for_read(Topic)]
+
+
+def _write_connection():
+    return connections[router.db_for_write(Topic)]
+
+
+def is_available(connection=None):
+    """True when the database supports the FTS5 index created by migration 0012."""
+    connection = connection or _write_connection()
+    if connection.alias not in _available:
+        _available[connection.alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[connection.alias]
+
+
+def plain_text(html):
+    """Flatten CKEditor HTML to whitespace-normalised text for indexing."""
+    return ' '.join(unescape(strip_tags(html or '')).split())
+
+
+def build_match_query(query):
+    """Turn free text into a safe FTS5 MATCH expression (implicit AND of prefix terms)."""
+    terms = _TOKEN_RE.findall(query.lower())[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+# --- INDEX MAINTENANCE ---
+
+def index_topic(topic):
+    """Insert or refresh a single topic; unpublished topics are dropped from the index."""
+    connection = _write_connection()
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [topic.pk])
+        if topic.status == 'published':
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                [topic.pk, topic.title, plain_text(topic.content)],
+            )
+
+
+def index_topics(topics):
+    """Add or refresh many topics in one statement (bulk_create and update() skip the post_save hook)."""
+    connection = _write_connection()
+    rows = [(topic.pk, topic.title, plain_text(topic.content)) for topic in topics if topic.status == 'published']
+    if not rows or not is_available(connection):
+        return 0
+    with connection.cursor() as cursor:
+        return _insert_batch(cursor, rows)
+
+
+def remove_topic(topic_id):
+    connection = _write_connection()
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [topic_id])
+
+
+def rebuild_index(batch_size=500):
+    """Re-create every index entry from the published topics. Returns the row count."""
+    connection = _write_connection()
+    if not is_available(connection):
+        return 0
+    total = 0
+    rows = (
+        Topic.objects.filter(status='published')
+        .values_list('pk', 'title', 'content')
+        .iterator(chunk_size=batch_size)
+    )
+    # One transaction, so searches never see a half-empty index and a failure keeps the old one
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for pk, title, content in rows:
+            batch.append((pk, title, plain_text(content)))
+            if len(batch) >= batch_size:
+                total += _insert_batch(cursor, batch)
+                batch = []
+        if batch:
+            total += _insert_batch(cursor, batch)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _insert_batch(cursor, batch):
+    cursor.executemany(
+        f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', batch
+    )
+    return len(batch)
+
+
+# --- QUERYING ---
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    )
+
+
+def search_topics(query, limit=50):
+    """
+    Return published topics matching `query`, best match first.
+    Each topic carries a `snippet` attribute with the matched terms highlighted.
+    """
+    connection = _read_connection()
+    if not is_available(connection):
+        topics = list(
+            Topic.objects.listing().filter(
+                Q(title__icontains=query) | Q(content__icontains=query),
+                status='published',
+            ).select_related('subject')[:limit]
+        )
+        for topic in topics:
+            topic.snippet = ''
+        return topics
+
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', %s)
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY bm25({FTS_TABLE}, %s, 1.0)
+            LIMIT %s
+            """,
+            [MARK_START, MARK_END, SNIPPET_TOKENS, match, TITLE_WEIGHT, limit],
+        )
+        hits = cursor.fetchall()
+
+    snippets = {pk: snippet for pk, snippet in hits}
+    topics = Topic.objects.listing().filter(pk__in=snippets, status='published').select_related('subject')
+    by_id = {topic.pk: topic for topic in topics}
+
+    results = []
+    for pk, snippet in hits:
+        topic = by_id.get(pk)
+        if topic is not None:
+            topic.snippet = _highlight(snippet)
+            results.append(topic)
+    return results
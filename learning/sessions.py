@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+REFRESHED_AT_KEY = '_refreshed_at'
+
+
+class CoalescingSessionMiddleware(SessionMiddleware):
+    """
+    Sliding session expiry without a write per request.
+
+    SESSION_SAVE_EVERY_REQUEST rewrites the session row on every page view just to
+    push its expiry forward. Here an unmodified session is only rewritten once its
+    remaining lifetime has dropped more than SESSION_REFRESH_INTERVAL seconds below
+    SESSION_COOKIE_AGE, so read-only browsing costs at most one write per interval
+    and a session never expires more than that interval earlier than it used to.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        # is_empty() doesn't load the session; a flushed session must stay empty
+        if session is not None and not session.is_empty():
+            now = int(time.time())
+            stale = self._needs_refresh(session, now)
+            # Loading can turn an expired or unknown session key into an empty session
+            if (session.modified or stale) and not session.is_empty():
+                # Every save pushes the expiry forward, so record it as a refresh
+                session[REFRESHED_AT_KEY] = now
+        return super().process_response(request, response)
+
+    def _needs_refresh(self, session, now):
+        interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 300)
+        remaining = session.get(REFRESHED_AT_KEY, 0) + settings.SESSION_COOKIE_AGE - now
+        return remaining < settings.SESSION_COOKIE_AGE - interval
@@ -1,9 +1,81 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Profile, Subject, Topic, Project
+from . import search
+from .jobs import enqueue
+from .revisions import record_revision
+from .navigation import invalidate_outline
+from .cache import bump_version
+from .context_processors import NAV_SUBJECTS_VERSION
+from .suggest import invalidate_suggestions
+from .roles import invalidate_role
+from .page_cache import invalidate_pages, subject_pages, SITE, TOPICS, PROJECTS
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def refresh_role(sender, instance, **kwargs):
+    # The cached role is keyed on this version, so it's re-read (e.g. after ProfileAdmin edits)
+    invalidate_role(instance.user_id)
+
+# --- PUBLISHED TOPIC INVALIDATION ---
+
+def refresh_public_topics(subject_ids):
+    """Retire cached outlines and public pages that list the published topics of these subjects."""
+    subject_ids = {subject_id for subject_id in subject_ids if subject_id}
+    invalidate_outline(*subject_ids)
+    invalidate_suggestions()
+    slugs = Subject.objects.filter(pk__in=subject_ids).values_list('slug', flat=True)
+    invalidate_pages(TOPICS, *(subject_pages(slug) for slug in slugs))
+
+def refresh_public_content():
+    """Retire every cached outline, nav list and public page, e.g. after the read replica was refreshed."""
+    invalidate_outline(*Subject.objects.values_list('pk', flat=True))
+    bump_version(NAV_SUBJECTS_VERSION)
+    invalidate_suggestions()
+    invalidate_pages(SITE)
+
+@receiver(post_save, sender=Topic)
+def topic_saved(sender, instance, update_fields=None, **kwargs):
+    # Kept inline: a queued job would only see the newest content, not each save
+    if update_fields is None or {'title', 'content'} & set(update_fields):
+        record_revision(instance)
+
+    # Rendering (if stale) and the search entry: publishing adds the topic to the
+    # index, any other status removes it. Queued until the save commits with JOBS_ASYNC.
+    enqueue('refresh_topic', {'id': instance.pk}, key=f'topic:{instance.pk}')
+
+    # Drafts and pending edits are invisible to the public, so they invalidate nothing
+    was_public = getattr(instance, '_loaded_status', None) == 'published'
+    if instance.status == 'published' or was_public:
+        refresh_public_topics({instance.subject_id, getattr(instance, '_loaded_subject_id', None)})
+        if update_fields is None or {'title', 'content', 'status'} & set(update_fields):
+            enqueue('related_topics', {'ids': [instance.pk]}, key=f'related:{instance.pk}')
+    instance._loaded_subject_id = instance.subject_id
+    instance._loaded_status = instance.status
+
+@receiver(post_delete, sender=Topic)
+def topic_deleted(sender, instance, **kwargs):
+    search.remove_topic(instance.pk)
+    if instance.status == 'published':
+        refresh_public_topics({instance.subject_id})
+        enqueue('related_topics', {'ids': [instance.pk]})
+
+# --- SUBJECTS & PROJECTS ---
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def refresh_nav_subjects(sender, **kwargs):
+    bump_version(NAV_SUBJECTS_VERSION)
+    invalidate_suggestions()
+    invalidate_pages(SITE)
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def refresh_project_pages(sender, **kwargs):
+    invalidate_pages(PROJECTS)
@@ -0,0 +1,149 @@
+import mimetypes
+import os
+import re
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+# ManifestStaticFilesStorage inserts a 12 character content hash before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHORT_CACHE_CONTROL = 'public, max-age=300'
+
+# Preference order when the client accepts several encodings equally
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _accepted_encodings(header):
+    """Accept-Encoding as {coding: q}; a malformed q-value counts as a refusal."""
+    weights = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def choose_encoding(header, available):
+    """
+    The coding in `available` the client weights highest, ENCODINGS order breaking
+    ties; `*` covers codings it doesn't name and q=0 refuses one. None for identity.
+    """
+    weights = _accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding, _ in ENCODINGS:
+        if coding not in available:
+            continue
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _StaticFile:
+    __slots__ = ('path', 'variants', 'mtime', 'content_type', 'immutable')
+
+    def __init__(self, root, name):
+        self.path = os.path.join(root, name)
+        self.variants = {
+            encoding: self.path + suffix
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(self.path + suffix)
+        }
+        self.mtime = int(os.path.getmtime(self.path))
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.immutable = bool(HASHED_NAME_RE.search(name))
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT in-process, before sessions,
+    auth and the ORM are touched. Picks the `.br` / `.gz` variant written by
+    CompressedManifestStaticFilesStorage and marks content-hashed names immutable.
+    The file index is built once per process, so collectstatic needs a restart.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        self._files = None
+        self._lock = threading.Lock()
+
+    def _index(self):
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    files = {}
+                    for directory, _, filenames in os.walk(self.root):
+                        for filename in filenames:
+                            if filename.endswith(('.gz', '.br')):
+                                continue
+                            name = os.path.relpath(os.path.join(directory, filename), self.root)
+                            files[name.replace(os.sep, '/')] = _StaticFile(self.root, name)
+                    self._files = files
+        return self._files
+
+    def _match(self, request):
+        # In DEBUG the staticfiles app serves straight from the source directories
+        if settings.DEBUG or not self.root or not request.path.startswith(self.prefix):
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return self._index().get(request.path[len(self.prefix):])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self._match(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    async def __acall__(self, request):
+        static_file = self._match(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return self.serve(request, static_file)
+
+    def serve(self, request, static_file):
+        cache_control = IMMUTABLE_CACHE_CONTROL if static_file.immutable else SHORT_CACHE_CONTROL
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if since is not None and static_file.mtime <= since:
+            response = HttpResponseNotModified()
+            response['Cache-Control'] = cache_control
+            return response
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), static_file.variants)
+        path = static_file.variants[encoding] if encoding else static_file.path
+
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=static_file.content_type,
+            filename=os.path.basename(static_file.path),
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = cache_control
+        response['Last-Modified'] = http_date(static_file.mtime)
+        return response
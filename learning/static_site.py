@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Project, RelatedTopic, Subject, Topic
+from .pagination import DEFAULT_PAGE_SIZE, STATIC_RENDER_HEADER
+from .popularity import UNCOUNTED_HEADER
+from .rendering import RENDER_PIPELINE_VERSION
+
+MANIFEST_NAME = '.build-manifest.json'
+RENDER_HOST = 'localhost'
+
+
+# --- FINGERPRINTS ---
+# A page is re-rendered only when the hash of the data it shows changes. Every
+# page also depends on the site-wide parts: nav subjects, templates, static
+# file names and the render pipeline.
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()
+
+
+def _tree_digest(*roots):
+    digest = hashlib.sha256()
+    for root in roots:
+        root = Path(root)
+        if not root.is_dir():
+            continue
+        for path in sorted(root.rglob('*.html')):
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _site_digest():
+    template_dirs = [d for config in settings.TEMPLATES for d in config.get('DIRS', [])]
+    static_manifest = Path(settings.STATIC_ROOT or '') / 'staticfiles.json'
+    return _digest(
+        list(Subject.objects.order_by('pk').values_list(
+            'pk', 'name', 'slug', 'description', 'display_order', 'is_active',
+        )),
+        _tree_digest(*template_dirs, Path(__file__).parent / 'templates'),
+        static_manifest.read_text() if static_manifest.is_file() else None,
+        RENDER_PIPELINE_VERSION,
+    )
+
+
+def plan_pages():
+    """Map every public page path to the fingerprint of the data it renders."""
+    site = _site_digest()
+    pages = {}
+
+    topics = list(
+        Topic.objects.filter(status='published')
+        .order_by('subject_id', 'id')
+        .values_list('pk', 'subject_id', 'slug', 'title', 'difficulty', 'created_at', 'updated_at')
+    )
+    by_subject = defaultdict(list)
+    for row in topics:
+        by_subject[row[1]].append(row)
+    # The refresh_topic job and image re-renders rewrite the stored HTML without
+    # touching updated_at, so topic pages also fingerprint the body itself
+    bodies = {
+        pk: hashlib.sha256(html.encode()).hexdigest()
+        for pk, html in (
+            Topic.objects.filter(status='published')
+            .values_list('pk', 'content_html').iterator(chunk_size=500)
+        )
+    }
+
+    # Home: the first page of newest topics, rendered without a pager (later pages need the live site)
+    newest = sorted(topics, key=lambda row: (row[5], row[0]), reverse=True)[:DEFAULT_PAGE_SIZE]
+    pages[reverse('home')] = _digest(site, newest)
+
+    projects = defaultdict(list)
+    for project in Project.objects.select_related('category', 'user').order_by('pk'):
+        row = (
+            project.pk, project.title, project.description, project.problem_statement,
+            project.solution_approach, project.tech_stack, project.github_url,
+            project.live_demo_url, project.status, project.created_at,
+            project.category.name if project.category else None, project.user.username,
+        )
+        projects[project.subject_id].append(row)
+        pages[reverse('project_detail', args=[project.pk])] = _digest(site, row)
+
+    related = defaultdict(list)
+    for topic_id, *link in (
+        RelatedTopic.objects.filter(topic__status='published', related__status='published')
+        .order_by('topic_id', 'rank')
+        .values_list('topic_id', 'related__subject__slug', 'related__slug', 'related__title')
+    ):
+        related[topic_id].append(link)
+
+    subject_slugs = dict(Subject.objects.values_list('pk', 'slug'))
+    for subject_id, slug in subject_slugs.items():
+        subject_topics = by_subject.get(subject_id, [])
+        # Outline the topic pages share: sidebar and prev/next links
+        outline = _digest([(row[0], row[2], row[3]) for row in subject_topics])
+        pages[reverse('subject_topics', args=[slug])] = _digest(site, subject_topics[:DEFAULT_PAGE_SIZE])
+        pages[reverse('subject_projects', args=[slug])] = _digest(
+            site, projects.get(subject_id, [])[:DEFAULT_PAGE_SIZE],
+        )
+        for row in subject_topics:
+            pages[reverse('topic_detail', args=[slug, row[2]])] = _digest(
+                site, outline, row, bodies.get(row[0]), related.get(row[0]),
+            )
+    return pages
+
+
+def output_path(root, url_path):
+    """`/subject/python/` -> `<root>/subject/python/index.html`."""
+    return Path(root) / url_path.strip('/') / 'index.html'
+
+
+# --- RENDERING (runs in worker processes) ---
+
+_client = None
+
+
+def _init_worker():
+    global _client
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learning_journal.settings')
+    django.setup()
+    from django.test import Client
+    _client = Client(HTTP_HOST=RENDER_HOST, **{UNCOUNTED_HEADER: '1', STATIC_RENDER_HEADER: '1'})
+
+
+def render_page(url_path):
+    """Render one page through the full middleware/template stack, as an uncounted anonymous reader."""
+    if _client is None:
+        _init_worker()
+    response = _client.get(url_path)
+    return url_path, response.status_code, response.content if response.status_code == 200 else b''
+
+
+def render_pages(paths, workers):
+    """Yield (path, status, content) for every path, using a process pool when workers > 1."""
+    if workers <= 1 or len(paths) < 2:
+        for path in paths:
+            yield render_page(path)
+        return
+    from django.db import connections
+    # Forked workers must not inherit open SQLite handles
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(render_page, paths, chunksize=max(1, len(paths) // (workers * 8)))
+
+
+# --- FILES ---
+
+def copy_file(source, destination):
+    """Copy `source` unless `destination` already has the same size and is no older. True if copied."""
+    stat = source.stat()
+    if destination.exists():
+        existing = destination.stat()
+        if existing.st_size == stat.st_size and existing.st_mtime >= stat.st_mtime:
+            return False
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, destination)
+    return True
+
+
+def copy_tree(source, target):
+    """Copy the files under `source` that are new or changed; returns how many were copied."""
+    source, target = Path(source), Path(target)
+    if not source.is_dir():
+        return 0
+    return sum(
+        copy_file(path, target / path.relative_to(source))
+        for path in source.rglob('*') if path.is_file()
+    )
+
+
+def load_manifest(root):
+    path = Path(root) / MANIFEST_NAME
+    return json.loads(path.read_text()) if path.is_file() else {}
+
+
+def save_manifest(root, manifest):
+    path = Path(root) / MANIFEST_NAME
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=0, sort_keys=True))
+    os.replace(tmp, path)
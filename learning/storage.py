@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz variants are written
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.txt', '.html', '.json', '.map', '.xml', '.ico'}
+# Below this size the compressed variant rarely saves a network round trip
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    `collectstatic` storage that writes content-hashed copies of every asset, a
+    manifest, and precompressed `.gz` / `.br` siblings that StaticAssetMiddleware
+    serves according to the client's Accept-Encoding.
+    """
+
+    # Templates referencing a file that was never collected keep their plain URL
+    # instead of taking the whole site down.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths)
+        names.update(self.hashed_files.values())
+        for name in sorted(names):
+            self.compress(name)
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        path = self.path(name)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            # Only keep variants that are actually smaller than the original
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+
+
+class ContentAddressedUploadStorage(FileSystemStorage):
+    """
+    CKEditor upload storage that names every file after the SHA-256 of its bytes,
+    so uploading the same screenshot twice stores it once, and queues resized WebP
+    variants for images (see images.py).
+    """
+
+    upload_dir = 'uploads'
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = posixpath.splitext(name or '')[1].lower()
+        name = posixpath.join(self.upload_dir, hexdigest[:2], f'{hexdigest}{extension}')
+        if not self.exists(name):
+            name = super().save(name, content, max_length=max_length)
+
+        from .images import schedule_variants
+        schedule_variants(name)
+        return name
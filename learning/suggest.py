@@ -0,0 +1,163 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.urls import reverse
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from .cache import get_version, bump_version
+from .models import Subject, Topic
+
+# Search-as-you-type over published topic titles and subject names, answered
+# from a process-local index so keystrokes never reach the database. Each query
+# word must match a word of the label: typed words exactly or within a few edits,
+# the word still being typed as a prefix (or, failing that, a misspelt prefix).
+# Fuzzy matching runs against the vocabulary of distinct words, which grows far
+# more slowly than the number of titles.
+
+SUGGESTIONS_VERSION = 'suggestions'
+
+SUGGEST_LIMIT = 8
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_WORDS = 6
+FUZZY_MIN_LENGTH = 3  # Shorter words have too many near neighbours to be worth guessing
+WORD_SCORE_CUTOFF = 75
+WORD_MATCHES = 10     # Closest vocabulary words tried per misspelt query word
+PREFIX_WORDS = 50     # Vocabulary words tried per prefix
+MAX_POSTINGS = 5000   # Best-ranked labels considered per word
+
+Suggestion = namedtuple('Suggestion', ['kind', 'label', 'subject_name', 'subject_slug', 'slug'])
+
+# Process-local (version, index) pair; replaced as a whole so threads never see half an update
+_local_index = (None, None)
+
+
+class SuggestionIndex:
+    """Labels in display order (subjects, then shorter titles first), with a word -> labels map."""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: (entry.kind != 'subject', len(entry.label), entry.label))
+        self.labels = [default_process(entry.label) for entry in self.entries]
+        postings = defaultdict(lambda: array('I'))
+        for position, label in enumerate(self.labels):
+            for word in dict.fromkeys(label.split()):
+                postings[word].append(position)
+        self.postings = dict(postings)
+        self.words = sorted(self.postings)
+        self.by_initial = defaultdict(list)
+        for word in self.words:
+            self.by_initial[word[0]].append(word)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- WORD MATCHING ---
+
+    def _word_matches(self, word):
+        if word in self.postings:
+            return {word: 100.0}
+        if len(word) < FUZZY_MIN_LENGTH:
+            return {}
+        # A typo in the first letter is rare enough to not search the whole vocabulary for it
+        return {
+            choice: score for choice, score, _ in process.extract(
+                word, self.by_initial.get(word[0], []), scorer=fuzz.ratio, processor=None,
+                limit=WORD_MATCHES, score_cutoff=WORD_SCORE_CUTOFF,
+            )
+        }
+
+    def _prefix_matches(self, prefix):
+        matches = {}
+        for word in self.words[bisect_left(self.words, prefix):]:
+            if not word.startswith(prefix) or len(matches) >= PREFIX_WORDS:
+                break
+            matches[word] = 100.0
+        if matches or len(prefix) < FUZZY_MIN_LENGTH:
+            return matches
+        # Compare against each word cut to the length typed so far
+        bucket = self.by_initial.get(prefix[0], [])
+        return {
+            bucket[index]: score for _, score, index in process.extract(
+                prefix, [word[:len(prefix)] for word in bucket], scorer=fuzz.ratio, processor=None,
+                limit=WORD_MATCHES, score_cutoff=WORD_SCORE_CUTOFF,
+            )
+        }
+
+    def _label_scores(self, matches):
+        scores = {}
+        for word, score in matches.items():
+            for position in self.postings[word][:MAX_POSTINGS]:
+                if scores.get(position, 0) < score:
+                    scores[position] = score
+        return scores
+
+    # --- QUERY ---
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Up to `limit` Suggestions for a partly typed query, best first."""
+        words = default_process(query[:MAX_QUERY_LENGTH]).split()[:MAX_QUERY_WORDS]
+        if not words:
+            return []
+        phrase = ' '.join(words)
+        totals = None
+        for position, word in enumerate(words):
+            last = position == len(words) - 1
+            scores = self._label_scores(self._prefix_matches(word) if last else self._word_matches(word))
+            if totals is None:
+                totals = scores
+            else:
+                totals = {label: total + scores[label] for label, total in totals.items() if label in scores}
+            if not totals:
+                return []
+        # Best total first; positions are already in display order for ties. Among
+        # the front runners, labels that start with what was typed go first.
+        shortlist = heapq.nsmallest(limit * 4, totals, key=lambda label: (-totals[label], label))
+        shortlist.sort(key=lambda label: (-totals[label], not self.labels[label].startswith(phrase), label))
+        return [self.entries[label] for label in shortlist[:limit]]
+
+
+def _build_index():
+    entries = [
+        Suggestion('subject', name, name, slug, None)
+        for name, slug in Subject.objects.filter(is_active=True).values_list('name', 'slug')
+    ]
+    entries += [
+        Suggestion('topic', *row)
+        for row in Topic.objects.filter(status='published').values_list('title', 'subject__name', 'subject__slug', 'slug')
+    ]
+    return SuggestionIndex(entries)
+
+
+def invalidate_suggestions():
+    bump_version(SUGGESTIONS_VERSION, timeout=settings.SUGGESTIONS_VERSION_TIMEOUT)
+
+
+def get_index():
+    """
+    This process's suggestion index, rebuilt once a topic is published or withdrawn
+    or a subject changes (changes made by other workers arrive within
+    SUGGESTIONS_VERSION_TIMEOUT when the cache isn't shared).
+    """
+    global _local_index
+    version = get_version(SUGGESTIONS_VERSION, timeout=settings.SUGGESTIONS_VERSION_TIMEOUT)
+    cached_version, index = _local_index
+    if cached_version != version:
+        index = _build_index()
+        _local_index = (version, index)
+    return index
+
+
+def suggestion_json(suggestion):
+    if suggestion.kind == 'subject':
+        url = reverse('subject_topics', args=[suggestion.subject_slug])
+    else:
+        url = reverse('topic_detail', args=[suggestion.subject_slug, suggestion.slug])
+    return {
+        'kind': suggestion.kind,
+        'label': suggestion.label,
+        'subject': suggestion.subject_name,
+        'url': url,
+    }
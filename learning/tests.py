@@ -1,3 +1,1110 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+from collections import Counter, OrderedDict
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import URLPattern, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import urls as learning_urls
+from .cache import get_version
+from .instrumentation import QueryCounter, get_query_budget
+from .importer import TopicImporter
+from .jobs import HANDLERS, claim_jobs, enqueue, run_job
+from .moderation import moderate_topics
+from .models import Job, Profile, Project, RelatedTopic, Subject, Topic, TopicRevision, TopicViewCount
+from .page_cache import SITE
+from .pagination import DEFAULT_PAGE_SIZE
+from . import exporting, images, popularity, related, search, static_site
+from .rendering import render_content
+from .revisions import SNAPSHOT_INTERVAL, prune_topic, review_diff, revision_content
+from .roles import invalidate_role, resolve_role
+from .search import FTS_TABLE, search_topics
+from .static_serving import choose_encoding
+from .suggest import Suggestion, SuggestionIndex, get_index
+
+
+# --- QUERY BUDGET HARNESS ---
+# Every named route in learning/urls.py needs a scenario here. Each scenario is
+# rendered against a small and a larger seeded dataset: it must stay within the
+# budget declared on the view with @query_budget, and its query count must not
+# grow with the number of rows (the signature of an N+1).
+
+def seed(rows):
+    """Seed `rows` topics per status plus `rows` projects. Returns the objects scenarios need."""
+    contributor = User.objects.create_user('contributor')
+    contributor.profile.role = 'contributor'
+    contributor.profile.save()
+    moderator = User.objects.create_user('moderator')
+    moderator.profile.role = 'moderator'
+    moderator.profile.save()
+    staff = User.objects.create_user('staff', is_staff=True)
+
+    subject = Subject.objects.create(name='Python', slug='python')
+    Subject.objects.create(name='Rust', slug='rust')
+    topics = {}
+    for status in ('published', 'pending', 'draft', 'rejected'):
+        for i in range(rows):
+            topics.setdefault(status, []).append(Topic.objects.create(
+                title=f'{status} topic {i}', subject=subject, author=contributor, status=status,
+                content=f'<p>Searchable body {i}</p><pre><code class="language-python">x = {i}</code></pre>',
+            ))
+    # Precomputed links, so topic pages render their related topics
+    published = topics['published']
+    RelatedTopic.objects.bulk_create(
+        RelatedTopic(topic=topic, related=published[(i + rank) % rows], rank=rank, score=1 / rank)
+        for i, topic in enumerate(published) for rank in range(1, min(rows, 4))
+    )
+    # Flushed view counts, so subject pages render their popular topics
+    TopicViewCount.objects.bulk_create(
+        TopicViewCount(topic=topic, subject=subject, views=100 - i) for i, topic in enumerate(published)
+    )
+    # A resubmitted edit, so the review page renders a revision diff
+    edited = topics['pending'][0]
+    edited.content += '<p>Added after review</p>'
+    edited.save()
+    projects = [
+        Project.objects.create(
+            user=contributor, title=f'Project {i}', subject=subject,
+            description='Description', tech_stack='Python, Django', status='Completed',
+        )
+        for i in range(rows)
+    ]
+    return {
+        'contributor': contributor, 'moderator': moderator, 'staff': staff, 'subject': subject,
+        'topic': topics['published'][rows // 2], 'pending': topics['pending'][0],
+        'pending_ids': [topic.pk for topic in topics['pending']],
+        'draft': topics['draft'][0], 'project': projects[0],
+    }
+
+
+# name -> (method, user key or None, url args builder, POST data or a builder for it)
+SCENARIOS = {
+    'home': ('get', None, lambda d: [], None),
+    'search': ('get', None, lambda d: [], None),
+    'search_suggest': ('get', None, lambda d: [], None),
+    'subject_topics': ('get', None, lambda d: [d['subject'].slug], None),
+    'subject_projects': ('get', None, lambda d: [d['subject'].slug], None),
+    'topic_detail': ('get', None, lambda d: [d['subject'].slug, d['topic'].slug], None),
+    'project_detail': ('get', None, lambda d: [d['project'].pk], None),
+    'contributor_dashboard': ('get', 'contributor', lambda d: [], None),
+    'topic_create': ('get', 'contributor', lambda d: [], None),
+    'topic_edit': ('get', 'contributor', lambda d: [d['draft'].pk], None),
+    'topic_delete': ('post', 'contributor', lambda d: [d['draft'].pk], {}),
+    'moderation_queue': ('get', 'moderator', lambda d: [], None),
+    'moderation_review': ('get', 'moderator', lambda d: [d['pending'].pk], None),
+    'approve_topic': ('post', 'moderator', lambda d: [d['pending'].pk], {}),
+    'reject_topic': ('post', 'moderator', lambda d: [d['pending'].pk], {'feedback': 'Needs examples'}),
+    'moderation_bulk': ('post', 'moderator', lambda d: [], lambda d: {'action': 'approve', 'topic_ids': d['pending_ids']}),
+    'signup': ('get', None, lambda d: [], None),
+    'login': ('get', None, lambda d: [], None),
+    'logout': ('post', 'contributor', lambda d: [], {}),
+    'export_content': ('get', 'staff', lambda d: [], None),
+}
+
+# Public pages measured again for a signed-in reader, against their signed_in budget
+SIGNED_IN_SCENARIOS = [
+    'home', 'search', 'search_suggest', 'subject_topics', 'subject_projects', 'topic_detail', 'project_detail',
+]
+
+# Views we don't own (Django's auth views) get their budget here instead
+EXTERNAL_BUDGETS = {
+    'logout': 4,
+}
+
+QUERY_STRINGS = {
+    'search': '?q=searchable',
+    'search_suggest': '?q=publshed top',
+    'export_content': '?format=zip&subject=python',
+}
+
+
+# Seeded topics must be rendered and indexed inline: TestCase never commits, so
+# queued jobs would never exist, let alone run. Without a related-topics index,
+# publishing leaves the seeded links alone; view counting is off so no flusher
+# thread outlives the test database.
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='', VIEW_FLUSH_INTERVAL=0)
+class QueryBudgetTests(TestCase):
+    small, large = 3, 12
+
+    def measure(self, name, rows, signed_in=False):
+        method, user_key, build_args, data = SCENARIOS[name]
+        if signed_in:
+            user_key = 'contributor'
+        with transaction.atomic():
+            objects = seed(rows)
+            cache.clear()
+            if user_key:
+                self.client.force_login(objects[user_key])
+            url = reverse(name, args=build_args(objects)) + QUERY_STRINGS.get(name, '')
+            if callable(data):
+                data = data(objects)
+            with QueryCounter() as counter:
+                response = getattr(self.client, method)(url, data, HTTP_HOST='localhost')
+            self.client.logout()
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f"{name} returned {response.status_code}")
+        return counter.count, resolve(url.split('?')[0]).func
+
+    def test_every_route_has_a_scenario(self):
+        names = {p.name for p in learning_urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+        self.assertEqual(names - SCENARIOS.keys(), set())
+
+    def cases(self):
+        return [(name, False) for name in SCENARIOS] + [(name, True) for name in SIGNED_IN_SCENARIOS]
+
+    def test_views_stay_within_query_budget(self):
+        for name, signed_in in self.cases():
+            with self.subTest(view=name, signed_in=signed_in):
+                count, view = self.measure(name, self.small, signed_in)
+                budget = get_query_budget(view, signed_in) or EXTERNAL_BUDGETS.get(name)
+                self.assertIsNotNone(budget, f"{name} has no @query_budget")
+                self.assertLessEqual(count, budget, f"{name} ran {count} queries (budget {budget})")
+
+    def test_query_count_does_not_scale_with_rows(self):
+        for name, signed_in in self.cases():
+            with self.subTest(view=name, signed_in=signed_in):
+                small_count, _ = self.measure(name, self.small, signed_in)
+                large_count, _ = self.measure(name, self.large, signed_in)
+                self.assertEqual(small_count, large_count, f"{name} looks like an N+1")
+
+
+# --- CONDITIONAL GET ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='', VIEW_FLUSH_INTERVAL=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        self.subject = Subject.objects.create(name='Python', slug='python')
+        self.topic, self.other = (
+            Topic.objects.create(
+                title=title, subject=self.subject, author=author, status='published', content='<p>Body</p>',
+            )
+            for title in ('First topic', 'Second topic')
+        )
+        self.url = reverse('topic_detail', args=['python', self.topic.slug])
+        cache.clear()
+
+    def get(self, **headers):
+        with QueryCounter() as counter:
+            response = self.client.get(self.url, headers=headers)
+        return response, counter.count
+
+    def test_cached_page_and_revalidation_run_no_queries(self):
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+        cached, count = self.get()
+        self.assertEqual((cached['X-Page-Cache'], count), ('hit', 0))
+        not_modified, count = self.get(if_none_match=response['ETag'])
+        self.assertEqual((not_modified.status_code, count), (304, 0))
+
+    def test_unpublishing_a_sibling_changes_the_etag(self):
+        etag = self.get()[0]['ETag']
+        # The sidebar no longer lists it, though no published topic's updated_at moved
+        self.other.status = 'draft'
+        self.other.save()
+        response, _ = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+# --- BACKGROUND JOBS ---
+
+@override_settings(JOBS_ASYNC=True, JOBS_EMBEDDED_WORKER=False, RELATED_INDEX_PATH='')
+class JobTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.subject = Subject.objects.create(name='Python', slug='python')
+
+    def create_topic(self, content='<p>First</p>'):
+        return Topic.objects.create(
+            title='Topic', subject=self.subject, author=self.author, status='published', content=content,
+        )
+
+    def run_queued(self):
+        while jobs := claim_jobs(20):
+            for job in jobs:
+                self.assertTrue(run_job(job), job.last_error)
+
+    def test_saves_queue_their_work_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = self.create_topic()
+            self.assertFalse(Job.objects.exists())
+        self.assertIn(('refresh_topic', f'topic:{topic.pk}'), Job.objects.values_list('name', 'key'))
+
+    def test_stale_html_is_served_until_the_job_replaces_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = self.create_topic()
+        # Never rendered: rendered on the fly meanwhile
+        self.assertEqual(Topic.objects.get(pk=topic.pk).rendered_content, '<p>First</p>')
+        self.run_queued()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = Topic.objects.get(pk=topic.pk)
+            topic.content = '<p>Second</p>'
+            topic.save()
+        self.assertEqual(Topic.objects.get(pk=topic.pk).rendered_content, '<p>First</p>')
+        self.run_queued()
+        self.assertEqual(Topic.objects.get(pk=topic.pk).rendered_content, '<p>Second</p>')
+
+    def test_polling_an_idle_queue_takes_no_write_lock(self):
+        Job.objects.create(name='later', payload={}, run_after=timezone.now() + timedelta(minutes=5))
+        # One SELECT and no transaction (which would show up here as a savepoint)
+        with self.assertNumQueries(1):
+            self.assertEqual(claim_jobs(20), [])
+
+    def flaky_job(self, handler):
+        self.enterContext(mock.patch.dict(HANDLERS, {'flaky': handler}))
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('flaky', {'n': 1}, key='flaky')
+        return Job.objects.get(name='flaky')
+
+    def make_due(self):
+        Job.objects.filter(status='queued').update(run_after=timezone.now())
+
+    def test_same_key_is_queued_once(self):
+        self.enterContext(mock.patch.dict(HANDLERS, {'noop': lambda payload: None}))
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('noop', key='same')
+            enqueue('noop', key='same')
+            enqueue('noop')
+        self.assertEqual(Job.objects.filter(key='same').count(), 1)
+        self.assertEqual(Job.objects.filter(key=None).count(), 1)
+
+        # Once a job is running, the same work can be queued again behind it
+        claim_jobs(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('noop', key='same')
+        self.assertCountEqual(Job.objects.filter(key='same').values_list('status', flat=True), ['running', 'queued'])
+
+    def test_failures_back_off_then_give_up(self):
+        job = self.flaky_job(mock.Mock(side_effect=ValueError('boom')))
+        delays = []
+        for attempt in range(1, job.max_attempts + 1):
+            [claimed] = claim_jobs(10)
+            started = timezone.now()
+            self.assertFalse(run_job(claimed))
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('ValueError: boom', job.last_error)
+            if job.status == 'queued':
+                # Not due again until the backoff has passed
+                self.assertEqual(claim_jobs(10), [])
+                delays.append(round((job.run_after - started).total_seconds()))
+                self.make_due()
+        self.assertEqual(job.status, 'failed')
+        delay = settings.JOBS_RETRY_DELAY
+        self.assertEqual(delays, [delay, delay * 2, delay * 4, delay * 8])
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_retry_yields_to_the_same_work_queued_meanwhile(self):
+        job = self.flaky_job(mock.Mock(side_effect=[ValueError('boom'), None]))
+        [claimed] = claim_jobs(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('flaky', {'n': 2}, key='flaky')
+        self.assertFalse(run_job(claimed))
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+        self.assertEqual(list(Job.objects.values_list('payload', 'status')), [({'n': 2}, 'queued')])
+
+    def test_expired_lease_is_claimed_again(self):
+        job = self.flaky_job(mock.Mock())
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        [claimed] = claim_jobs(10)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertTrue(run_job(claimed))
+        self.assertFalse(Job.objects.exists())
+
+
+# --- RELATED TOPICS ---
+
+THEMES = {
+    'async': 'asyncio event loop coroutine await task future gather scheduler'.split(),
+    'orm': 'queryset model migration foreign join index transaction database'.split(),
+    'numpy': 'array vector matrix broadcasting dtype ndarray slicing reshape'.split(),
+}
+COMMON = 'python code example function class object value return'.split()
+
+
+@override_settings(JOBS_ASYNC=False, VIEW_FLUSH_INTERVAL=0, RELATED_TOPICS_COUNT=3)
+class RelatedTopicTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'related_index.npz')
+        self.enterContext(override_settings(RELATED_INDEX_PATH=self.path))
+        self.random = random.Random(0)
+        self.author = User.objects.create_user('author')
+        self.subject = Subject.objects.create(name='Python', slug='python')
+        self.themes = {}
+        for i in range(15):
+            theme = list(THEMES)[i % 3]
+            self.themes[self.publish(theme, f'{theme} topic {i}').pk] = theme
+
+    def publish(self, theme, title):
+        words = [self.random.choice(THEMES[theme] if self.random.random() < 0.5 else COMMON) for _ in range(200)]
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = Topic.objects.create(
+                title=title, subject=self.subject, author=self.author, status='published',
+                content=f'<p>{" ".join(words)}</p>',
+            )
+        return topic
+
+    def links(self, topic):
+        return list(RelatedTopic.objects.filter(topic=topic).order_by('rank').values_list('related_id', flat=True))
+
+    def test_nothing_happens_before_the_first_build(self):
+        self.assertIsNone(related.update_related([1]))
+
+    def test_published_topic_is_fitted_into_the_saved_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            related.build_related()
+        with open(self.path, 'rb') as handle:
+            saved = handle.read()
+
+        topic = self.publish('orm', 'orm newcomer')
+        self.assertEqual(len(self.links(topic)), 3)
+        self.assertEqual({self.themes[pk] for pk in self.links(topic)}, {'orm'})
+        # Existing topics of the theme can link to it too
+        self.assertTrue(RelatedTopic.objects.filter(related=topic).exists())
+        # The build's index was only added to
+        with open(self.path, 'rb') as handle:
+            self.assertEqual(handle.read(), saved)
+        self.assertEqual(len(os.listdir(related._updates_dir(self.path))), 1)
+
+    def test_withdrawn_topic_leaves_every_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            related.build_related()
+        topic = Topic.objects.get(pk=next(iter(self.themes)))
+        self.assertTrue(RelatedTopic.objects.filter(related=topic).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            topic.status = 'draft'
+            topic.save()
+        self.assertFalse(RelatedTopic.objects.filter(Q(topic=topic) | Q(related=topic)).exists())
+        index = related._Index(self.path)
+        self.assertNotIn(topic.pk, index.ids[index.alive])
+
+    def test_update_files_are_merged_once_there_are_many(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            related.build_related()
+        with mock.patch.object(related, 'MAX_UPDATE_FILES', 2):
+            for i in range(5):
+                self.publish('numpy', f'numpy newcomer {i}')
+        self.assertLessEqual(len(os.listdir(related._updates_dir(self.path))), 3)
+        index = related._Index(self.path)
+        published = Topic.objects.filter(status='published').values_list('pk', flat=True)
+        self.assertCountEqual(index.ids[index.alive].tolist(), published)
+
+
+# --- EXPORT ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        subject = Subject.objects.create(name='Python', slug='python')
+        for i in range(5):
+            Topic.objects.create(
+                title=f'Topic {i}', subject=subject, author=self.staff, status='published', content=f'<p>{i}</p>',
+            )
+
+    async def test_asgi_export_streams_one_record_at_a_time(self):
+        await self.async_client.aforce_login(self.staff)
+        with mock.patch.object(exporting, 'topic_record', wraps=exporting.topic_record) as topic_record:
+            response = await self.async_client.get(reverse('export_content'))
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            # Nothing past the first record was read or serialised yet
+            self.assertEqual(topic_record.call_count, 1)
+            rest = [chunk async for chunk in chunks]
+        records = [json.loads(line) for line in b''.join([first, *rest]).decode().splitlines()]
+        self.assertEqual([record['title'] for record in records], [f'Topic {i}' for i in range(5)])
+
+
+# --- SESSIONS ---
+
+WORKER_CACHES = {
+    **settings.CACHES,
+    'worker-a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-a'},
+    'worker-b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-b'},
+}
+
+
+def worker_session(alias, session_key=None):
+    """A session store as seen by a worker whose own cache is `alias`."""
+    with override_settings(SESSION_CACHE_ALIAS=alias):
+        return import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+
+
+@override_settings(CACHES=WORKER_CACHES)
+class SessionTests(TestCase):
+    def test_session_flushed_in_one_worker_is_rejected_by_another(self):
+        session = worker_session('worker-a')
+        session['_auth_user_id'] = '1'
+        session.save()
+        # The other worker reads the session, and caches it if the engine does
+        self.assertEqual(worker_session('worker-b', session.session_key).load().get('_auth_user_id'), '1')
+
+        session_key = session.session_key
+        session.flush()  # What logout() does
+        self.assertEqual(worker_session('worker-b', session_key).load(), {})
+
+
+# --- ROLES ---
+
+class RoleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('moderator')
+        self.user.profile.role = 'moderator'
+        self.user.profile.save()
+        self.session = SessionStore()
+        cache.clear()
+
+    def resolve(self):
+        request = RequestFactory().get('/')
+        request.user, request.session = self.user, self.session
+        return resolve_role(request)
+
+    def demote_in_another_worker(self):
+        # update() skips the signal, as a bump in another worker's cache would never be seen here
+        Profile.objects.filter(user=self.user).update(role='reader')
+
+    @override_settings(SHARED_CACHE=False)
+    def test_role_is_read_from_the_database_without_a_shared_cache(self):
+        self.assertEqual(self.resolve(), 'moderator')
+        self.demote_in_another_worker()
+        self.assertEqual(self.resolve(), 'reader')
+
+    @override_settings(SHARED_CACHE=True, ROLE_CACHE_SECONDS=60)
+    def test_cached_role_is_reread_once_invalidated_or_expired(self):
+        self.assertEqual(self.resolve(), 'moderator')
+        self.demote_in_another_worker()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve(), 'moderator')
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(self.resolve(), 'reader')
+
+        Profile.objects.filter(user=self.user).update(role='moderator')
+        invalidate_role(self.user.pk)
+        self.assertEqual(self.resolve(), 'moderator')
+        # Nothing about the role goes into the session, so it's never rewritten for it
+        self.assertFalse(self.session.modified)
+
+
+# --- SUGGESTIONS ---
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        self.subject = Subject.objects.create(name='Python', slug='python')
+        self.topic = Topic.objects.create(
+            title='Decorators explained', subject=self.subject, author=author, status='draft', content='<p>Body</p>',
+        )
+        cache.clear()
+
+    def labels(self, query):
+        return [suggestion.label for suggestion in get_index().suggest(query)]
+
+    def test_publish_reaches_the_index(self):
+        self.assertEqual(self.labels('decorators'), [])
+        self.topic.status = 'published'
+        self.topic.save()
+        self.assertEqual(self.labels('decorators'), ['Decorators explained'])
+
+    @override_settings(SHARED_CACHE=False, SUGGESTIONS_VERSION_TIMEOUT=60)
+    def test_publish_in_another_worker_arrives_once_the_version_lapses(self):
+        self.assertEqual(self.labels('decorators'), [])
+        # update() skips the signal, like a publish whose version bump stayed in another worker's cache
+        Topic.objects.filter(pk=self.topic.pk).update(status='published')
+        self.assertEqual(self.labels('decorators'), [])
+        site_version = get_version(SITE)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(self.labels('decorators'), ['Decorators explained'])
+            # Only the suggestion index lapses; page cache and ETag generations keep theirs
+            self.assertEqual(get_version(SITE), site_version)
+
+    def test_ranking(self):
+        titles = [
+            'Python decorators', 'Decorators explained', 'Class decorators in depth', 'Decorator',
+            'Generators', 'Generator expressions', 'Asyncio event loop', 'Descriptors',
+        ]
+        index = SuggestionIndex(
+            [Suggestion('subject', 'Python', 'Python', 'python', None)]
+            + [Suggestion('topic', title, 'Python', 'python', title.lower()) for title in titles]
+        )
+        cases = [
+            # Subjects before topics
+            ('pyth', ['Python', 'Python decorators']),
+            # Labels starting with the query first, then shorter labels
+            ('  DECO ', ['Decorator', 'Decorators explained', 'Python decorators', 'Class decorators in depth']),
+            # A misspelt prefix, and a misspelt finished word
+            ('generatr', ['Generators', 'Generator expressions']),
+            ('decoratrs expl', ['Decorators explained']),
+            # Every word has to match
+            ('python generators', []),
+            ('xyz', []),
+            ('', []),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual([suggestion.label for suggestion in index.suggest(query)], expected)
+        self.assertEqual(len(index.suggest('d', limit=2)), 2)
+
+
+# --- VIEW COUNTS ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='', VIEW_FLUSH_INTERVAL=30)
+class ViewCountTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        subject = Subject.objects.create(name='Python', slug='python')
+        self.topic = Topic.objects.create(title='Decorators', subject=subject, author=author, status='published')
+        self.url = reverse('topic_detail', args=['python', self.topic.slug])
+        # No flusher thread: the tests flush by hand
+        self.enterContext(mock.patch.object(popularity, '_start_flusher'))
+        self.enterContext(mock.patch.object(popularity, '_pending', Counter()))
+
+    def views(self):
+        return TopicViewCount.objects.filter(topic=self.topic).values_list('views', flat=True).first()
+
+    def test_views_are_buffered_then_written_once(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertIsNone(self.views())
+        self.assertEqual(popularity.flush_views(), 1)
+        self.assertEqual(self.views(), 2)
+        self.assertEqual(popularity.flush_views(), 0)
+        self.assertEqual(self.views(), 2)
+
+    def test_failed_flush_keeps_the_views_for_the_next_one(self):
+        self.client.get(self.url)
+        with mock.patch.object(popularity.transaction, 'atomic', side_effect=OperationalError('database is locked')):
+            self.assertEqual(popularity.flush_views(), 0)
+        self.client.get(self.url)
+        self.assertEqual(popularity.flush_views(), 1)
+        self.assertEqual(self.views(), 2)
+
+    def test_static_site_build_is_not_counted(self):
+        with mock.patch.object(static_site, '_client', None):
+            _, status, _ = static_site.render_page(self.url)
+        self.assertEqual(status, 200)
+        self.assertEqual(popularity.flush_views(), 0)
+        self.assertIsNone(self.views())
+
+
+# --- STATIC SITE ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class StaticSiteTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        subject = Subject.objects.create(name='Python', slug='python')
+        Topic.objects.bulk_create([
+            Topic(title=f'Topic {i}', slug=f'topic-{i}', subject=subject, author=author, status='published')
+            for i in range(DEFAULT_PAGE_SIZE + 1)
+        ])
+        self.enterContext(mock.patch.object(static_site, '_client', None))
+
+    def test_rendered_listings_have_no_cursor_links(self):
+        for url in (reverse('home'), reverse('subject_topics', args=['python'])):
+            with self.subTest(url=url):
+                # Rendered live first, so a page cached for the live site would show up here
+                self.assertContains(self.client.get(url, HTTP_HOST=static_site.RENDER_HOST), '?after=')
+                _, status, content = static_site.render_page(url)
+                self.assertEqual(status, 200)
+                self.assertNotIn(b'?after=', content)
+                self.assertNotIn(b'pager', content)
+
+
+    def test_topic_page_is_replanned_when_its_body_is_re_rendered(self):
+        topic = Topic.objects.get(slug='topic-0')
+        url = reverse('topic_detail', args=['python', topic.slug])
+
+        # Saved with queued rendering: the job rewrites content_html later
+        with override_settings(JOBS_ASYNC=True, JOBS_EMBEDDED_WORKER=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                topic.content = '<p><img src="/media/a.png"></p>'
+                topic.save()
+        before = static_site.plan_pages()[url]
+        while jobs := claim_jobs(20):
+            for job in jobs:
+                run_job(job)
+        after_job = static_site.plan_pages()[url]
+        self.assertNotEqual(after_job, before)
+
+        # Image variants arriving re-render it without a new pipeline version
+        variants = {'width': 600, 'height': 400, 'webp': [('/media/variants/a-480.webp', 480)]}
+        with mock.patch('learning.rendering.variants_for_url', return_value=variants):
+            self.assertEqual(images.rerender_topics_using(['a.png']), 1)
+        self.assertNotEqual(static_site.plan_pages()[url], after_job)
+
+
+# --- IMAGE VARIANTS ---
+
+class SidecarCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.object(images, '_sidecars', OrderedDict()))
+        self.storage = InMemoryStorage()
+        self.opens = self.enterContext(mock.patch.object(self.storage, 'open', wraps=self.storage.open))
+
+    def test_miss_is_cached_briefly(self):
+        self.assertIsNone(images.load_sidecar('a.png', self.storage))
+        self.assertIsNone(images.load_sidecar('a.png', self.storage))
+        self.assertEqual(self.opens.call_count, 1)
+        later = time.monotonic() + images.SIDECAR_MISS_SECONDS + 1
+        with mock.patch.object(images.time, 'monotonic', return_value=later):
+            images.load_sidecar('a.png', self.storage)
+        self.assertEqual(self.opens.call_count, 2)
+
+    def test_generating_variants_replaces_a_cached_miss(self):
+        buffer = BytesIO()
+        Image.new('RGB', (600, 400)).save(buffer, 'PNG')
+        self.storage.save('a.png', ContentFile(buffer.getvalue()))
+        self.assertIsNone(images.load_sidecar('a.png', self.storage))
+        images.generate_variants('a.png', self.storage)
+        self.assertEqual(images.load_sidecar('a.png', self.storage)['width'], 600)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        with mock.patch.object(images, 'SIDECAR_CACHE_SIZE', 2):
+            for name in ('a.png', 'b.png', 'a.png', 'c.png'):
+                images.load_sidecar(name, self.storage)
+        self.assertEqual(list(images._sidecars), ['a.png', 'c.png'])
+
+
+# --- STATIC FILES ---
+
+class AcceptEncodingTests(SimpleTestCase):
+    def test_choice_follows_q_values(self):
+        both = {'br', 'gzip'}
+        cases = [
+            ('', both, None),
+            ('identity', both, None),
+            ('gzip, deflate, br', both, 'br'),
+            ('gzip, br;q=0', both, 'gzip'),
+            ('br;q=0.5, gzip', both, 'gzip'),
+            ('br;q=0.8, GZIP;q=0.8', both, 'br'),
+            ('gzip;q=0', {'gzip'}, None),
+            ('gzip;q=bogus', {'gzip'}, None),
+            ('*', both, 'br'),
+            ('br;q=0, *;q=0.1', both, 'gzip'),
+            ('brotli, x-gzip', both, None),
+        ]
+        for header, available, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header, available), expected)
+
+
+# --- SEARCH ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.subject = Subject.objects.create(name='Python', slug='python')
+
+    def create_topic(self, title, content='', status='published'):
+        return Topic.objects.create(
+            title=title, subject=self.subject, author=self.author, status=status, content=content,
+        )
+
+    def titles(self, query):
+        return [topic.title for topic in search_topics(query)]
+
+    def indexed_ids(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {FTS_TABLE} ORDER BY rowid')
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_title_matches_outrank_body_matches(self):
+        self.create_topic('Iterators', '<p>Generators, generators and more generators.</p>')
+        self.create_topic('Generators', '<p>Lazy sequences.</p>')
+        self.assertEqual(self.titles('generators'), ['Generators', 'Iterators'])
+
+    def test_terms_are_prefixes_and_all_required(self):
+        self.create_topic('Generators', '<p>Lazy sequences.</p>')
+        self.assertEqual(self.titles('gen lazy'), ['Generators'])
+        self.assertEqual(self.titles('gen eager'), [])
+
+    def test_fts_syntax_in_queries_is_literal(self):
+        self.create_topic('Generators')
+        for query in ('"', 'gen* OR', 'NEAR(gen', '-', 'title:gen'):
+            with self.subTest(query=query):
+                search_topics(query)
+        self.assertEqual(self.titles('title:gen'), [])
+
+    def test_snippets_escape_the_article_text(self):
+        self.create_topic('Escaping', '<p>&lt;script&gt;alert(1)&lt;/script&gt; generators</p>')
+        snippet = search_topics('generators')[0].snippet
+        self.assertIn('<mark>generators</mark>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        topics = [self.create_topic('Generators'), self.create_topic('Iterators')]
+        with mock.patch('learning.search.plain_text', side_effect=['', RuntimeError('bad markup')]):
+            with self.assertRaises(RuntimeError):
+                search.rebuild_index(batch_size=1)
+        self.assertEqual(self.indexed_ids(), [topic.pk for topic in topics])
+
+    def test_index_follows_the_topic_lifecycle(self):
+        topic = self.create_topic('Generators', status='draft')
+        self.assertEqual(self.indexed_ids(), [])
+        topic.status = 'published'
+        topic.save()
+        self.assertEqual(self.titles('generators'), ['Generators'])
+
+        topic.title = 'Coroutines'
+        topic.save()
+        self.assertEqual(self.titles('generators'), [])
+        self.assertEqual(self.titles('coroutines'), ['Coroutines'])
+
+        topic.status = 'pending'
+        topic.save()
+        self.assertEqual(self.indexed_ids(), [])
+        topic.status = 'published'
+        topic.save()
+        topic.delete()
+        self.assertEqual(self.indexed_ids(), [])
+
+
+# --- PAGINATION ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        subject = Subject.objects.create(name='Python', slug='python')
+        Topic.objects.bulk_create([
+            Topic(title=f'Topic {i}', slug=f'topic-{i}', subject=subject, author=author, status='published')
+            for i in range(2 * DEFAULT_PAGE_SIZE + 5)
+        ])
+        # Three timestamps a few microseconds apart, so most rows tie on created_at
+        base = timezone.now().replace(microsecond=500)
+        for topic in Topic.objects.all():
+            Topic.objects.filter(pk=topic.pk).update(created_at=base + timedelta(microseconds=topic.pk % 3))
+        self.expected = list(Topic.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def get(self, url):
+        return self.client.get(url, {'format': 'json'} if '?' not in url else None).json()
+
+    def test_following_next_visits_every_topic_once_in_order(self):
+        pages, data = [], self.get(reverse('home'))
+        while True:
+            pages.append([row['id'] for row in data['results']])
+            if not data['next']:
+                break
+            data = self.get(data['next'])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [DEFAULT_PAGE_SIZE, DEFAULT_PAGE_SIZE, 5])
+
+        # ...and following previous from the last page retraces them
+        back = []
+        while data['previous']:
+            data = self.get(data['previous'])
+            back.append([row['id'] for row in data['results']])
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_malformed_cursors_fall_back_to_the_first_page(self):
+        first = self.get(reverse('home'))['results']
+        for cursor in ('garbage', 'WzFd', 'WyJub3QtYS1kYXRlIiwxXQ', '%%%'):
+            with self.subTest(cursor=cursor):
+                data = self.get(f"{reverse('home')}?format=json&after={cursor}")
+                self.assertEqual(data['results'], first)
+                self.assertIsNone(data['previous'])
+
+    def test_other_query_parameters_survive_paging(self):
+        data = self.get(reverse('home'))
+        self.assertIn('format=json', data['next'])
+        self.assertNotIn('before=', self.get(data['next'])['next'])
+
+
+# --- RENDERING ---
+
+class SanitizerTests(SimpleTestCase):
+    def test_payloads(self):
+        cases = [
+            ('<script>alert(1)</script><p>ok</p>', '<p>ok</p>'),
+            ('<script><script></script>alert(1)</script>', 'alert(1)'),
+            ('<iframe src="https://e.com"><p>inside</p></iframe>after', 'after'),
+            ('<noscript><p title="</noscript><img src=x onerror=alert(1)>"></noscript>', ''),
+            ('<!-- <script>alert(1)</script> -->c', 'c'),
+            ('<svg onload=alert(1)><p>t</p></svg>', '<p>t</p>'),
+            ('<img src=x onerror=alert(1)>', '<img src="x" loading="lazy" decoding="async">'),
+            ('<img src="data:image/svg+xml;base64,PHN2Zz4=">', '<img loading="lazy" decoding="async">'),
+            ('<a href="javascript:alert(1)">x</a>', '<a>x</a>'),
+            ('<a href=" JaVaScRiPt:alert(1)">x</a>', '<a>x</a>'),
+            ('<a href="java&#x09;script:alert(1)">x</a>', '<a>x</a>'),
+            ('<a href="&#106;avascript:alert(1)">x</a>', '<a>x</a>'),
+            ('<a href="javascript&colon;alert(1)">x</a>', '<a>x</a>'),
+            ('<a href="vbscript:msgbox">x</a><oembed url="javascript:alert(1)"></oembed>', '<a>x</a><oembed></oembed>'),
+            (
+                '<a target=_blank rel=opener href="https://e.com">x</a>',
+                '<a target="_blank" href="https://e.com" rel="noopener noreferrer">x</a>',
+            ),
+            (
+                '<figure style="background:url(javascript:alert(1))"></figure><figure style="width:50%"></figure>',
+                '<figure></figure><figure style="width:50%"></figure>',
+            ),
+            (
+                '<p title=\'"><script>alert(1)</script>\'>t</p>',
+                '<p title="&quot;&gt;&lt;script&gt;alert(1)&lt;/script&gt;">t</p>',
+            ),
+            (
+                '<pre><code class="language-&quot;&gt;&lt;script&gt;">x</code></pre>',
+                '<pre><code class="language-&quot;&gt;&lt;script&gt;">x</code></pre>',
+            ),
+            ('<div><b>unclosed', '<div><b>unclosed</b></div>'),
+            ('<p>a</b></i></p></div>', '<p>a</p>'),
+        ]
+        for payload, expected in cases:
+            with self.subTest(payload=payload):
+                self.assertEqual(render_content(payload), expected)
+
+    def test_highlighted_code_stays_escaped(self):
+        html = render_content('<pre><code class="language-python">&lt;script&gt;alert(1)&lt;/script&gt;</code></pre>')
+        self.assertNotIn('<script', html)
+        self.assertIn('&lt;', html)
+
+
+# --- IMPORT ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class ImportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'topics.jsonl')
+
+    def write(self, *records):
+        with open(self.path, 'w') as handle:
+            handle.writelines(json.dumps(record) + '\n' for record in records)
+
+    def record(self, title, **fields):
+        return {'title': title, 'subject': 'Python', 'content': f'<p>{title}</p>', **fields}
+
+    def run_import(self, *args):
+        call_command('import_content', self.path, '--author', 'author', *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_resume_continues_after_the_last_committed_batch(self):
+        self.write(*(self.record(f'Topic {i}') for i in range(5)))
+        import_batch = TopicImporter.import_batch
+        calls = []
+
+        def fail_second_batch(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return import_batch(importer, rows)
+
+        with mock.patch.object(TopicImporter, 'import_batch', fail_second_batch):
+            with self.assertRaisesMessage(CommandError, 'rerun with --resume'):
+                self.run_import('--batch-size', '2')
+        self.assertEqual(Topic.objects.count(), 2)
+        with open(f'{self.path}.checkpoint') as handle:
+            self.assertEqual(json.load(handle)['records'], 2)
+
+        self.run_import('--batch-size', '2', '--resume')
+        self.assertEqual(sorted(Topic.objects.values_list('title', flat=True)), [f'Topic {i}' for i in range(5)])
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_slugs_never_collide(self):
+        subject = Subject.objects.create(name='Python', slug='python')
+        Topic.objects.create(title='Decorators', subject=subject, author=self.author)
+        long_slug = 'a' * 300
+        self.write(
+            self.record('Decorators'),
+            self.record('Decorators'),
+            self.record('Anything', slug='decorators-2'),
+            self.record('Long one', slug=long_slug),
+            self.record('Long two', slug=long_slug),
+        )
+        self.run_import('--batch-size', '2')
+        self.assertEqual(list(Topic.objects.order_by('pk').values_list('slug', flat=True)), [
+            'decorators', 'decorators-2', 'decorators-3', 'decorators-2-2', 'a' * 255, 'a' * 253 + '-2',
+        ])
+
+    def test_bad_records_are_skipped_and_the_rest_imported(self):
+        self.write(
+            self.record('Kept', status='published'),
+            {'subject': 'Python', 'content': '<p>No title</p>'},
+            self.record('Bad status', status='archived'),
+            self.record('Stranger', author='nobody'),
+        )
+        self.run_import()
+        topic = Topic.objects.get()
+        self.assertEqual((topic.title, topic.subject.slug), ('Kept', 'python'))
+        self.assertEqual([hit.pk for hit in search_topics('kept')], [topic.pk])
+
+    def test_records_of_the_wrong_shape_are_skipped(self):
+        self.write(
+            [1, 2],
+            'x',
+            {**self.record('Numeric title'), 'title': 5},
+            self.record('Numeric reference', references=[{'url': 7}]),
+            self.record('Kept'),
+        )
+        stderr = StringIO()
+        call_command('import_content', self.path, '--author', 'author', stdout=StringIO(), stderr=stderr)
+        self.assertEqual(list(Topic.objects.values_list('title', flat=True)), ['Kept'])
+        # Finished rather than crashed, so there's nothing for --resume to trip over again
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+        self.assertIn('Skipped line 1: not an object', stderr.getvalue())
+        self.assertIn('Skipped line 3: title must be a string', stderr.getvalue())
+        self.assertIn('Skipped line 4: url must be a string', stderr.getvalue())
+
+
+# --- MODERATION ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class ModerationTests(TestCase):
+    def setUp(self):
+        self.moderator = User.objects.create_user('moderator')
+        self.moderator.profile.role = 'moderator'
+        self.moderator.profile.save()
+        self.subject = Subject.objects.create(name='Python', slug='python')
+
+    def create_topic(self, title, status='pending'):
+        return Topic.objects.create(
+            title=title, subject=self.subject, author=self.moderator, status=status, content=f'<p>{title}</p>',
+        )
+
+    def test_second_decision_on_a_topic_is_a_conflict(self):
+        topic = self.create_topic('Generators')
+        self.assertEqual(moderate_topics([topic.pk], 'approve').changed, [(topic.pk, 'Generators')])
+
+        result = moderate_topics([topic.pk], 'reject', 'Needs examples')
+        self.assertEqual((result.changed, result.conflicts), ([], [(topic.pk, 'Generators', 'published')]))
+        topic.refresh_from_db()
+        self.assertEqual((topic.status, topic.rejection_notes), ('published', ''))
+
+    def test_batch_moves_only_pending_topics(self):
+        pending = [self.create_topic(f'Pending {i}') for i in range(2)]
+        draft = self.create_topic('Draft', status='draft')
+        published = self.create_topic('Live', status='published')
+        ids = [pending[0].pk, pending[0].pk, pending[1].pk, draft.pk, published.pk, 10 ** 6]
+
+        result = moderate_topics(ids, 'reject', 'Needs examples')
+        self.assertEqual([pk for pk, _ in result.changed], [topic.pk for topic in pending])
+        self.assertCountEqual(
+            result.conflicts, [(draft.pk, 'Draft', 'draft'), (published.pk, 'Live', 'published')],
+        )
+        self.assertEqual(
+            set(Topic.objects.filter(status='rejected').values_list('rejection_notes', flat=True)), {'Needs examples'},
+        )
+
+    def test_approval_reaches_search_and_the_public_pages(self):
+        topic = self.create_topic('Generators')
+        url = reverse('subject_topics', args=['python'])
+        self.assertNotContains(self.client.get(url), 'Generators')
+        with self.captureOnCommitCallbacks(execute=True):
+            moderate_topics([topic.pk], 'approve')
+        self.assertEqual([hit.pk for hit in search_topics('generators')], [topic.pk])
+        self.assertContains(self.client.get(url), 'Generators')
+
+    def test_bulk_view_reports_each_conflict(self):
+        first, second = self.create_topic('First'), self.create_topic('Second')
+        moderate_topics([second.pk], 'approve')
+        self.client.force_login(self.moderator)
+        response = self.client.post(
+            reverse('moderation_bulk'), {'action': 'approve', 'topic_ids': [first.pk, second.pk]}, follow=True,
+        )
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['1 topic published.', "'Second' was already published by another moderator; nothing changed."],
+        )
+
+
+# --- REVISIONS ---
+
+@override_settings(JOBS_ASYNC=False, RELATED_INDEX_PATH='')
+class RevisionTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('author')
+        subject = Subject.objects.create(name='Python', slug='python')
+        self.rng = random.Random(7)
+        self.paragraphs = [f'<p>Paragraph {i}: {" ".join(self.rng.choices(COMMON, k=30))}</p>' for i in range(30)]
+        self.topic = Topic.objects.create(
+            title='Generators', subject=subject, author=author, content=''.join(self.paragraphs),
+        )
+        self.saved = {1: self.topic.content}
+
+    def edit(self, times):
+        rng = self.rng
+        for _ in range(times):
+            index = rng.randrange(len(self.paragraphs))
+            change = rng.choice(['insert', 'delete', 'rewrite'])
+            if change == 'insert':
+                self.paragraphs.insert(index, f'<h2>{rng.random()}</h2>')
+            elif change == 'delete' and len(self.paragraphs) > 1:
+                del self.paragraphs[index]
+            else:
+                self.paragraphs[index] = f'<p>{rng.random()}</p>'
+            self.topic.content = ''.join(self.paragraphs)
+            self.topic.save()
+            self.saved[self.topic.revisions.count()] = self.topic.content
+
+    def test_every_revision_rebuilds_exactly(self):
+        self.edit(2 * SNAPSHOT_INTERVAL + 5)
+        for number, content in self.saved.items():
+            self.assertEqual(revision_content(self.topic.pk, number), content)
+        revisions = list(self.topic.revisions.order_by('number'))
+        self.assertEqual(
+            [revision.number for revision in revisions if revision.is_snapshot],
+            [1, SNAPSHOT_INTERVAL + 1, 2 * SNAPSHOT_INTERVAL + 1],
+        )
+        # Deltas hold only the edited block, not the article
+        self.assertTrue(all(len(revision.data) < 200 for revision in revisions if not revision.is_snapshot))
+
+    def test_unchanged_save_records_nothing(self):
+        self.topic.save()
+        self.assertEqual(self.topic.revisions.count(), 1)
+        self.topic.title = 'Generator functions'
+        self.topic.save()
+        self.assertEqual(self.topic.revisions.count(), 2)
+
+    def test_rewrite_is_stored_as_a_snapshot(self):
+        self.topic.content = f'<p>{" ".join(self.rng.choices(COMMON, k=400))}</p>'
+        self.topic.save()
+        self.assertTrue(self.topic.revisions.get(number=2).is_snapshot)
+        self.assertEqual(revision_content(self.topic.pk, 2), self.topic.content)
+
+    def test_pruning_keeps_the_rest_rebuildable(self):
+        self.edit(24)
+        self.topic.revisions.filter(number=7).update(reviewed=True)
+        self.assertEqual(prune_topic(self.topic.pk, keep=5), 19)
+        kept = list(self.topic.revisions.order_by('number').values_list('number', flat=True))
+        self.assertEqual(kept, [7, 21, 22, 23, 24, 25])
+        for number in kept:
+            self.assertEqual(revision_content(self.topic.pk, number), self.saved[number])
+        self.assertEqual(prune_topic(self.topic.pk, keep=5), 0)
+
+    def test_review_diff_shows_only_the_edited_block(self):
+        TopicRevision.objects.filter(topic=self.topic).update(reviewed=True)
+        self.paragraphs[3] = '<p>Rewritten</p>'
+        self.topic.content = ''.join(self.paragraphs)
+        self.topic.save()
+        diff = review_diff(self.topic)
+        self.assertEqual(diff.base.number, 1)
+        changes = [hunk for hunk in diff.hunks if hunk['kind'] == 'change']
+        self.assertEqual(len(changes), 1)
+        self.assertIn('Rewritten', changes[0]['added'])
+        self.assertIn('Paragraph 3', changes[0]['removed'])
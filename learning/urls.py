@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 from django.contrib.auth import views as auth_views # Import auth_views
 from django.views.decorators.cache import never_cache
 
+# Coroutine versions of the public read views, served under ASGI (see async_views.py)
+public = async_views if settings.ASYNC_PUBLIC_VIEWS else views
+
 urlpatterns = [
 
     # --- ADD THESE FOR AUTH ---
@@ -10,21 +14,22 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='logout'),
 
     # --- PUBLIC PAGES ---
-    path('', views.home, name='home'),
-    path('search/', views.search, name='search'),
+    path('', public.home, name='home'),
+    path('search/', public.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
 
     # --- SUBJECT & TOPIC HIERARCHY ---
     # subject/python/projects/
     path('subject/<slug:slug>/projects/', views.subject_projects, name='subject_projects'),
     
     # subject/python/
-    path('subject/<slug:slug>/', views.subject_topics, name='subject_topics'),
+    path('subject/<slug:slug>/', public.subject_topics, name='subject_topics'),
 
     # subject/python/django-basics/
-    path('subject/<slug:subject_slug>/<slug:topic_slug>/', views.topic_detail, name='topic_detail'),
+    path('subject/<slug:subject_slug>/<slug:topic_slug>/', public.topic_detail, name='topic_detail'),
     
     # projects/1/
-    path('projects/<int:pk>/', views.project_detail, name='project_detail'),
+    path('projects/<int:pk>/', public.project_detail, name='project_detail'),
 
 
     # --- CONTRIBUTOR DASHBOARD & EDITOR ---
@@ -43,6 +48,9 @@ urlpatterns = [
     # Approval action (usually called via POST button in queue)
     path('moderate/approve/<int:pk>/', views.approve_topic, name='approve_topic'),
 
+    # Bulk approve / reject from the queue
+    path('moderate/bulk/', views.moderation_bulk, name='moderation_bulk'),
+
 
     # --- AUTHENTICATION ---
     path('signup/', views.signup, name='signup'),
@@ -50,4 +58,7 @@ urlpatterns = [
     path('topic/<int:pk>/delete/', views.delete_topic, name='topic_delete'),
 
     path('moderate/reject/<int:pk>/', views.reject_topic, name='reject_topic'),
+
+    # --- EXPORT ---
+    path('export/', views.export_content, name='export_content'),
 ]
\ No newline at end of file
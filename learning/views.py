@@ -1,16 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.urls import reverse
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm  # Added AuthenticationForm
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import never_cache
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+from django.views.decorators.cache import cache_control, never_cache
 from django.contrib import messages
 from .models import Subject, Topic, Project 
 from .forms import TopicForm 
-from .decorators import role_required
+from .decorators import count_topic_views, role_required, query_budget, read_replica
+from .search import search_topics
+from .suggest import get_index, suggestion_json
+from .navigation import related_topics, topic_navigation
+from .popularity import popular_topics
+from .page_cache import cache_public_page, subject_pages, TOPICS, PROJECTS
+from .conditional import topic_conditional, subject_conditional
+from .pagination import paginate_keyset, wants_json, keyset_json_response
+from .moderation import TRANSITIONS, moderate_topics
+from .revisions import review_diff
+from .exporting import STREAM_FORMATS, STREAM_WRITERS, astream, export_topics, iter_export
 
 # --- AUTH & PUBLIC VIEWS ---
 
+@query_budget(2)
 @never_cache 
 def login_view(request):
     """Handles login and prevents authenticated users from seeing the form via back button."""
@@ -35,98 +50,160 @@ def login_view(request):
     context_data = {'form': form}
     return render(request, 'registration/login.html', context_data)
 
+def _topic_json(topic):
+    return {
+        'id': topic.id,
+        'title': topic.title,
+        'url': topic.get_absolute_url(),
+        'subject': topic.subject.name,
+        'difficulty': topic.difficulty,
+        'created_at': topic.created_at,
+        'updated_at': topic.updated_at,
+    }
+
+@query_budget(2, signed_in=8)
+@read_replica
+@cache_public_page(lambda: [TOPICS])
 @never_cache  # Added to prevent caching the home state (logged in vs logged out)
 def home(request):
     """Public landing page showing only live topics."""
-    topics = Topic.objects.filter(status='published').order_by('-created_at')
-    return render(request, 'home.html', {'topics': topics})
+    topics = Topic.objects.listing().filter(status='published').select_related('subject')
+    page = paginate_keyset(request, topics, keys=('-created_at', '-id'))
+    if wants_json(request):
+        return keyset_json_response(page, _topic_json)
+    return render(request, 'home.html', {'topics': page.items, 'page': page})
 
+@query_budget(4, signed_in=10)
+@read_replica
+@subject_conditional
+@cache_public_page(lambda slug: [subject_pages(slug)])
 def subject_topics(request, slug):
     """List of published topics within a specific subject."""
     subject = get_object_or_404(Subject, slug=slug)
-    nav_subjects = Subject.objects.filter(is_active=True)
-    topics = Topic.objects.filter(subject=subject, status='published')
+    topics = Topic.objects.listing().filter(subject=subject, status='published').select_related('subject')
+    page = paginate_keyset(request, topics, keys=('id',))
+    if wants_json(request):
+        return keyset_json_response(page, _topic_json)
     return render(request, 'subject_topics.html', {
         'subject': subject,
-        'topics': topics,
-        'nav_subjects': nav_subjects,
+        'topics': page.items,
+        'page': page,
+        'popular_topics': popular_topics(subject),
     })
 
 # ADDED TO FIX URL ERRORS
+@query_budget(3, signed_in=9)
+@cache_public_page(lambda slug: [PROJECTS])
 def subject_projects(request, slug):
     """subject/python/projects/"""
     subject = get_object_or_404(Subject, slug=slug)
     projects = Project.objects.filter(subject=subject)
-    return render(request, 'learning/subject_projects.html', {'subject': subject, 'projects': projects})
+    page = paginate_keyset(request, projects, keys=('id',))
+    if wants_json(request):
+        return keyset_json_response(page, lambda project: {
+            'id': project.id,
+            'title': project.title,
+            'url': reverse('project_detail', args=[project.id]),
+            'status': project.status,
+            'tech_stack': project.tech_stack,
+        })
+    return render(request, 'learning/subject_projects.html', {
+        'subject': subject,
+        'projects': page.items,
+        'page': page,
+    })
 
+@query_budget(4, signed_in=10)
+@count_topic_views
+@read_replica
+@topic_conditional
+@cache_public_page(lambda subject_slug, topic_slug: [subject_pages(subject_slug)])
 def topic_detail(request, subject_slug, topic_slug):
     """Detailed article view."""
-    topic = get_object_or_404(Topic, slug=topic_slug, subject__slug=subject_slug, status='published')
-    sidebar_topics = Topic.objects.filter(subject=topic.subject, status='published').order_by('id')
-
-    next_topic = Topic.objects.filter(
-        subject=topic.subject, 
-        status='published', 
-        id__gt=topic.id
-    ).order_by('id').first()
-
-    previous_topic = Topic.objects.filter(
-        subject=topic.subject, 
-        status='published', 
-        id__lt=topic.id
-    ).order_by('-id').first()
+    topic = get_object_or_404(
+        Topic.objects.select_related('subject'),
+        slug=topic_slug, subject__slug=subject_slug, status='published',
+    )
+    # Sidebar and prev/next all come from the cached per-subject outline
+    sidebar_topics, previous_topic, next_topic = topic_navigation(topic)
 
     context = {
         'topic': topic,
         'sidebar_topics': sidebar_topics,
         'next_topic': next_topic,
         'previous_topic': previous_topic,
+        'related_topics': related_topics(topic),
     }
     return render(request, 'learning/topic_detail.html', context)
 
 # ADDED TO FIX URL ERRORS
+@query_budget(2, signed_in=8)
+@read_replica
+@cache_public_page(lambda pk: [PROJECTS])
 def project_detail(request, pk):
     """projects/1/"""
-    project = get_object_or_404(Project, pk=pk)
+    project = get_object_or_404(Project.objects.select_related('subject', 'category', 'user'), pk=pk)
     return render(request, 'learning/project_detail.html', {'project': project})
 
+@query_budget(3, signed_in=9)
+@read_replica
+@cache_public_page(lambda: [TOPICS])
 def search(request):
     """Search functionality restricted to published content."""
     query = request.GET.get('q', '').strip()
     
     if query:
-        # We assign the queryset to a variable named 'results' 
-        # to match your search_results.html template
-        results = Topic.objects.filter(
-            Q(title__icontains=query) | Q(content__icontains=query),
-            status='published'
-        ).distinct()
+        # Ranked hits from the full-text index, each with a highlighted snippet
+        results = search_topics(query)
     else:
-        results = Topic.objects.none()
+        results = []
 
     return render(request, 'search_results.html', {
         'query': query, 
-        'results': results  # This MUST match the {% for topic in results %} in your HTML
+        'results': results,  # This MUST match the {% for topic in results %} in your HTML
+        'suggestions': spelling_suggestions(query, results),
     })
 
+def spelling_suggestions(query, results):
+    """Closest titles for a query the full-text index found nothing for, e.g. a misspelling."""
+    if not query or results:
+        return []
+    return [suggestion_json(suggestion) for suggestion in get_index().suggest(query)]
+
+@query_budget(2, signed_in=6)
+@read_replica
+@cache_control(max_age=60)
+def search_suggest(request):
+    """JSON suggestions for the navbar search box, served from this process's in-memory title index."""
+    query = request.GET.get('q', '').strip()
+    suggestions = get_index().suggest(query) if query else []
+    return JsonResponse({'query': query, 'suggestions': [suggestion_json(suggestion) for suggestion in suggestions]})
+
 
 # --- CONTRIBUTOR VIEWS (Security Applied) ---
 
+@query_budget(8)
 @never_cache
 @login_required
 @role_required(allowed_roles=['contributor', 'moderator', 'admin'])
 def contributor_dashboard(request):
     """Author's personal workspace."""
-    user_topics = Topic.objects.filter(author=request.user).order_by('-updated_at')
-    
+    user_topics = Topic.objects.listing().filter(author=request.user).select_related('subject').order_by('-updated_at')
+
+    # One query for all four columns, split by status in Python
+    columns = {'draft': [], 'rejected': [], 'pending': [], 'published': []}
+    for topic in user_topics:
+        columns.setdefault(topic.status, []).append(topic)
+
     context = {
-        'drafts': user_topics.filter(status='draft'),
-        'rejected': user_topics.filter(status='rejected'),
-        'pending': user_topics.filter(status='pending'),
-        'approved': user_topics.filter(status='published'),
+        'drafts': columns['draft'],
+        'rejected': columns['rejected'],
+        'pending': columns['pending'],
+        'approved': columns['published'],
     }
     return render(request, 'learning/contributor_dashboard.html', context)
 
+@query_budget(8)
 @never_cache
 @login_required
 @role_required(allowed_roles=['contributor', 'moderator', 'admin'])
@@ -144,6 +221,7 @@ def create_topic(request):
         form = TopicForm()
     return render(request, 'learning/topic_form.html', {'form': form, 'action': 'Create'})
 
+@query_budget(9)
 @never_cache
 @login_required
 @role_required(allowed_roles=['contributor', 'moderator', 'admin'])
@@ -151,7 +229,7 @@ def edit_topic(request, pk):
     """Edit existing topic and handle resubmission logic."""
     topic = get_object_or_404(Topic, pk=pk)
     
-    if topic.author != request.user and request.user.profile.role not in ['admin', 'moderator']:
+    if topic.author_id != request.user.pk and request.role not in ['admin', 'moderator']:
         messages.error(request, "Unauthorized access.")
         return redirect('home')
 
@@ -171,56 +249,93 @@ def edit_topic(request, pk):
 
 # --- MODERATION VIEWS (Restricted to Staff) ---
 
+@query_budget(8)
 @never_cache
 @login_required
 @role_required(allowed_roles=['admin', 'moderator'])
 def moderation_queue(request):
     """Central hub for moderators."""
-    pending_topics = Topic.objects.filter(status='pending').order_by('-created_at')
+    pending_topics = Topic.objects.listing().filter(status='pending').select_related('subject', 'author').order_by('-created_at')
     return render(request, 'learning/moderation_queue.html', {'pending_topics': pending_topics})
 
+@query_budget(10)
 @never_cache
 @login_required
 @role_required(allowed_roles=['admin', 'moderator'])
 def moderation_review(request, pk):
     """Full detail review before publishing."""
-    topic = get_object_or_404(Topic, pk=pk, status='pending')
-    return render(request, 'learning/moderation_review.html', {'topic': topic})
+    topic = get_object_or_404(Topic.objects.select_related('subject', 'author'), pk=pk, status='pending')
+    return render(request, 'learning/moderation_review.html', {'topic': topic, 'diff': review_diff(topic)})
+
+def _report_moderation(request, result, done_message):
+    if result.changed:
+        messages.success(request, done_message)
+    for pk, title, status in result.conflicts:
+        messages.warning(request, f"'{title}' was already {status} by another moderator; nothing changed.")
+
 
+@query_budget(13)
 @never_cache # Added to prevent caching review actions
 @login_required
 @role_required(allowed_roles=['admin', 'moderator'])
 def approve_topic(request, pk):
     """Change status to published to make it live."""
-    topic = get_object_or_404(Topic, pk=pk)
     if request.method == 'POST':
-        topic.status = 'published'
-        topic.rejection_notes = "" 
-        topic.save()
-        messages.success(request, f"'{topic.title}' is now live on the platform!")
+        # Only moves the topic if it is still pending, so concurrent reviews can't both win
+        result = moderate_topics([pk], 'approve')
+        if not result.changed and not result.conflicts:
+            raise Http404("No Topic matches the given query.")
+        title = (result.changed or result.conflicts)[0][1]
+        _report_moderation(request, result, f"'{title}' is now live on the platform!")
     return redirect('moderation_queue')
 
+@query_budget(11)
 @never_cache # Added to prevent caching review actions
 @login_required
 @role_required(allowed_roles=['admin', 'moderator'])
 def reject_topic(request, pk):
     """Send back to author with feedback."""
-    topic = get_object_or_404(Topic, pk=pk)
     if request.method == 'POST':
         feedback = request.POST.get('feedback')
         if not feedback:
             messages.error(request, "Please provide feedback before requesting changes.")
             return redirect('moderation_review', pk=pk)
-            
-        topic.status = 'rejected'
-        topic.rejection_notes = feedback
-        topic.save()
-        messages.warning(request, f"Changes requested for '{topic.title}'.")
+
+        result = moderate_topics([pk], 'reject', feedback)
+        if not result.changed and not result.conflicts:
+            raise Http404("No Topic matches the given query.")
+        title = (result.changed or result.conflicts)[0][1]
+        _report_moderation(request, result, f"Changes requested for '{title}'.")
+    return redirect('moderation_queue')
+
+@query_budget(13)
+@never_cache
+@login_required
+@role_required(allowed_roles=['admin', 'moderator'])
+def moderation_bulk(request):
+    """Approve or reject every checked topic in the queue in one transaction."""
+    if request.method != 'POST':
+        return redirect('moderation_queue')
+    action = request.POST.get('action')
+    feedback = request.POST.get('feedback', '').strip()
+    topic_ids = [pk for pk in request.POST.getlist('topic_ids') if pk.isdigit()]
+    if action not in TRANSITIONS or not topic_ids:
+        messages.error(request, "Select at least one topic and an action.")
+        return redirect('moderation_queue')
+    if action == 'reject' and not feedback:
+        messages.error(request, "Please provide feedback before requesting changes.")
+        return redirect('moderation_queue')
+
+    result = moderate_topics(topic_ids, action, feedback)
+    count = len(result.changed)
+    done = "published" if action == 'approve' else "sent back for changes"
+    _report_moderation(request, result, f"{count} topic{'s' if count != 1 else ''} {done}.")
     return redirect('moderation_queue')
 
 
 # --- AUTH & PROJECTS ---
 
+@query_budget(2)
 @never_cache # Prevent accessing signup via back-button when logged in
 def signup(request):
     if request.user.is_authenticated:
@@ -236,6 +351,7 @@ def signup(request):
         form = UserCreationForm()
     return render(request, 'registration/signup.html', {'form': form})
 
+@query_budget(12)
 @never_cache
 @login_required
 def delete_topic(request, pk):
@@ -244,4 +360,31 @@ def delete_topic(request, pk):
     if request.method == 'POST':
         topic.delete()
         messages.success(request, "Topic deleted successfully.")
-    return redirect('contributor_dashboard')
\ No newline at end of file
+    return redirect('contributor_dashboard')
+
+
+# --- EXPORT (Staff only) ---
+
+@query_budget(6)
+@never_cache
+@staff_member_required
+def export_content(request):
+    """Stream a backup of the topics: ?format=jsonl|zip&subject=<slug>&status=all."""
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in STREAM_FORMATS:
+        return HttpResponseBadRequest(f"Unknown export format; use one of {', '.join(STREAM_FORMATS)}.")
+    subject = None
+    if request.GET.get('subject'):
+        subject = get_object_or_404(Subject, slug=request.GET['subject'])
+    topics = iter_export(export_topics(subject, include_unpublished=request.GET.get('status') == 'all'))
+
+    content_type, extension = STREAM_FORMATS[fmt]
+    stream = STREAM_WRITERS[fmt](topics)
+    if isinstance(request, ASGIRequest):
+        stream = astream(stream)
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    name = subject.slug if subject else 'all'
+    response['Content-Disposition'] = (
+        f'attachment; filename="learning-journal-{name}-{timezone.now():%Y%m%d}.{extension}"'
+    )
+    return response
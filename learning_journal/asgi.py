@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learning_journal.settings')
+# Serve the public read views as coroutines (learning/async_views.py)
+os.environ.setdefault('ASYNC_PUBLIC_VIEWS', 'True')
 
 application = get_asgi_application()
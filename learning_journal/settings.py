@@ -31,11 +31,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'learning.instrumentation.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'learning.static_serving.StaticAssetMiddleware',
+    'learning.sessions.CoalescingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'learning.middleware.RoleMiddleware',
+    'learning.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -95,19 +99,92 @@ CKEDITOR_5_CONFIGS = {
 }
 
 WSGI_APPLICATION = 'learning_journal.wsgi.application'
+# Route the public read views to their async versions (learning/async_views.py).
+# asgi.py turns this on; under WSGI they would only add thread hops.
+ASYNC_PUBLIC_VIEWS = os.getenv('ASYNC_PUBLIC_VIEWS', 'False') == 'True'
 
 # --- DATABASE ---
+# Run on every new SQLite connection. WAL lets readers carry on while a moderator
+# writes, busy_timeout waits for the write lock instead of failing with
+# "database is locked", and synchronous=NORMAL is durable in WAL mode.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+    'cache_size': -64000,  # KiB, i.e. 64 MB of page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock when the transaction starts, so concurrent writers queue
+            # on busy_timeout rather than deadlocking when a read lock is upgraded
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Keep connections open across requests (pragmas are only applied once)
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# --- READ REPLICA ---
+# Optional local copy of the database that serves public read-only views
+# (see learning/routers.py). Refresh it with `manage.py refresh_replica`.
+REPLICA_DB_PATH = os.getenv('REPLICA_DB_PATH')
+if REPLICA_DB_PATH:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_DB_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['learning.routers.ReadReplicaRouter']
+# How long a browser keeps reading from the primary after it wrote something
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 60))
+
+# --- CACHING ---
+# Per-process memory by default. Multi-worker deployments should point every
+# worker at one shared backend so cache invalidation reaches all of them.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_DIR = os.getenv('CACHE_DIR')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif CACHE_DIR:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_DIR}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'learning-journal',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Whether every worker sees the same cache. Anything that must not go stale in
+# other workers (sessions, invalidation counters) checks this before relying on it.
+SHARED_CACHE = bool(REDIS_URL or CACHE_DIR)
+
+# The suggestion index is rebuilt when its generation counter (learning/cache.py)
+# changes. A per-process cache only hears of publishes made in its own worker, so
+# there the counter lapses after this many seconds and other workers catch up
+# within that time, at the cost of one index rebuild per worker each time.
+SUGGESTIONS_VERSION_TIMEOUT = None if SHARED_CACHE else int(os.getenv('SUGGESTIONS_VERSION_TIMEOUT', 60))
+
+# 'local' keeps the nav subject list in each process; 'shared' also stores it in the cache above
+NAV_SUBJECTS_CACHE = os.getenv('NAV_SUBJECTS_CACHE', 'shared' if SHARED_CACHE else 'local')
+
 # --- AUTHENTICATION & REDIRECTS ---
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'contributor_dashboard'
 LOGOUT_REDIRECT_URL = 'home'
+# Longest a role cached in the shared cache outlives a change that skipped the
+# Profile signals (learning/roles.py). Without a shared cache nothing is cached:
+# signed-in requests read the role from Profile, one indexed query each.
+ROLE_CACHE_SECONDS = int(os.getenv('ROLE_CACHE_SECONDS', 60))
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -127,12 +204,62 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic writes content-hashed names, a manifest and .gz/.br variants;
+# StaticAssetMiddleware serves them with far-future immutable caching.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "learning.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
-CKEDITOR_5_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+# Uploads are stored once per distinct content and get resized WebP variants
+# (learning/images.py); rendering swaps them in via <picture> + srcset.
+CKEDITOR_5_FILE_STORAGE = "learning.storage.ContentAddressedUploadStorage"
 CKEDITOR_5_UPLOAD_FILE_VIEW_NAME = "ckeditor5_upload_file"
 
+# --- IMAGE VARIANTS ---
+IMAGE_VARIANT_WIDTHS = (480, 960, 1600)
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_VARIANTS_ASYNC = True
+
+# --- BACKGROUND JOBS ---
+# Rendering, search indexing, related topics and image variants are queued in the
+# learning_job table once the save commits, and run by a background thread in the
+# web process (JOBS_EMBEDDED_WORKER) and/or `manage.py run_jobs`. JOBS_ASYNC off
+# runs them inline during the save, for tests and one-off scripts.
+JOBS_ASYNC = os.getenv('JOBS_ASYNC', 'True') == 'True'
+# Turn off where dedicated `run_jobs` workers keep up with the queue on their own
+JOBS_EMBEDDED_WORKER = os.getenv('JOBS_EMBEDDED_WORKER', 'True') == 'True'
+JOBS_POLL_INTERVAL = 5  # seconds between embedded-worker checks for retries and leftovers
+JOBS_BATCH_SIZE = 20
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_LEASE_SECONDS = 300
+JOBS_RETRY_DELAY = 10  # seconds; doubles with every failed attempt
+
+# --- RELATED TOPICS ---
+# Precomputed by `manage.py build_related_topics` (learning/related.py); publishing
+# a topic then updates its links incrementally against the saved index, which the
+# build writes next to RELATED_INDEX_PATH (vectors) and updates append to.
+RELATED_TOPICS_COUNT = 5
+RELATED_MIN_SCORE = 0.05  # cosine similarity below which a topic isn't worth linking
+RELATED_DIMENSIONS = int(os.getenv('RELATED_DIMENSIONS', 512))
+RELATED_INDEX_PATH = os.getenv('RELATED_INDEX_PATH', BASE_DIR / 'related_index.npz')
+
+# --- VIEW COUNTS ---
+# Topic views are added up per worker and flushed to TopicViewCount in one
+# transaction every VIEW_FLUSH_INTERVAL seconds (learning/popularity.py); 0 turns counting off.
+VIEW_FLUSH_INTERVAL = int(os.getenv('VIEW_FLUSH_INTERVAL', 30))
+POPULAR_TOPICS_COUNT = 5
+POPULAR_TOPICS_REFRESH = 60 * 10  # seconds a subject's popular list is reused
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # --- SESSION & SECURITY MANAGEMENT ---
@@ -141,5 +268,15 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_SECURE = not DEBUG
-# Ensure session is saved on every request to keep it fresh
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+# Sessions are kept fresh by learning.sessions.CoalescingSessionMiddleware, which
+# only rewrites an unchanged session once per SESSION_REFRESH_INTERVAL seconds
+# instead of on every request (SESSION_SAVE_EVERY_REQUEST).
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', 300))
+# With a shared cache, reads come from it and writes go through to the database.
+# A per-process cache would keep a logged-out or flushed session alive in every
+# other worker, so then sessions are read from the database.
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
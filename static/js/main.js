@@ -97,6 +97,92 @@ document.addEventListener("click", (e) => {
     });
   }
 
+  // --- 5. BULK MODERATION ---
+  const selectAll = document.getElementById("bulk-select-all");
+  if (selectAll) {
+    selectAll.addEventListener("change", () => {
+      document.querySelectorAll('input[name="topic_ids"]').forEach(box => {
+        box.checked = selectAll.checked;
+      });
+    });
+  }
+
+  // --- 6. SEARCH AUTOCOMPLETE ---
+  const searchForm = document.querySelector(".nav-search[data-suggest-url]");
+  if (searchForm) {
+    const searchInput = searchForm.querySelector('input[name="q"]');
+    const suggestionList = searchForm.querySelector(".search-suggestions");
+    let debounceTimer = null;
+    let pending = null;
+    let activeIndex = -1;
+
+    const closeSuggestions = () => {
+      suggestionList.hidden = true;
+      suggestionList.innerHTML = "";
+      searchInput.setAttribute("aria-expanded", "false");
+      activeIndex = -1;
+    };
+
+    const showSuggestions = (suggestions) => {
+      suggestionList.innerHTML = "";
+      suggestions.forEach((suggestion) => {
+        const item = document.createElement("li");
+        item.setAttribute("role", "option");
+        const link = document.createElement("a");
+        link.href = suggestion.url;
+        link.textContent = suggestion.label;
+        if (suggestion.kind === "topic") {
+          const subject = document.createElement("small");
+          subject.textContent = suggestion.subject;
+          link.appendChild(subject);
+        }
+        item.appendChild(link);
+        suggestionList.appendChild(item);
+      });
+      activeIndex = -1;
+      suggestionList.hidden = suggestions.length === 0;
+      searchInput.setAttribute("aria-expanded", suggestions.length ? "true" : "false");
+    };
+
+    const fetchSuggestions = () => {
+      const query = searchInput.value.trim();
+      if (pending) pending.abort();
+      if (query.length < 2) {
+        closeSuggestions();
+        return;
+      }
+      pending = new AbortController();
+      fetch(`${searchForm.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, { signal: pending.signal })
+        .then((response) => (response.ok ? response.json() : { suggestions: [] }))
+        .then((data) => showSuggestions(data.suggestions))
+        .catch(() => {}); // Aborted by a newer keystroke
+    };
+
+    searchInput.addEventListener("input", () => {
+      clearTimeout(debounceTimer);
+      debounceTimer = setTimeout(fetchSuggestions, 150);
+    });
+
+    searchInput.addEventListener("keydown", (e) => {
+      const items = suggestionList.querySelectorAll("li");
+      if (suggestionList.hidden || !items.length) return;
+      if (e.key === "ArrowDown" || e.key === "ArrowUp") {
+        e.preventDefault();
+        activeIndex = (activeIndex + (e.key === "ArrowDown" ? 1 : -1) + items.length) % items.length;
+        items.forEach((item, i) => item.classList.toggle("active", i === activeIndex));
+      } else if (e.key === "Enter" && activeIndex >= 0) {
+        e.preventDefault();
+        window.location.href = items[activeIndex].querySelector("a").href;
+      } else if (e.key === "Escape") {
+        closeSuggestions();
+      }
+    });
+
+    document.addEventListener("click", (e) => {
+      if (!searchForm.contains(e.target)) closeSuggestions();
+    });
+  }
+
   // Progress Bar
   window.onscroll = function () {
     const winScroll = document.body.scrollTop || document.documentElement.scrollTop;